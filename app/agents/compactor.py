@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+from functools import lru_cache
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from app.utils.clients import get_chat_model
+from app.utils.rate_limit import RateLimited
+
+# Configuration
+# Maximum number of tokens of research notes sent to the reporter
+CONTEXT_TOKEN_BUDGET = int(os.getenv("REPORT_CONTEXT_TOKENS", "12000"))
+# Passages sharing at least this fraction of their word 5-grams count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Size of each group summarized in the map step
+MAP_GROUP_TOKENS = 4000
+# How many map-reduce rounds before falling back to plain truncation
+MAX_REDUCE_ROUNDS = 3
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+# 1. Token counting
+@lru_cache(maxsize=1)
+def _encoding():
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; without network, estimate instead
+        print(f"⚠️ tiktoken unavailable ({e.__class__.__name__}), estimating tokens as chars/4.")
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+# 2. Deduplication
+def split_passages(texts):
+    """Splits every context entry into paragraphs (the unit of deduplication)."""
+    passages = []
+    for text in texts:
+        for passage in re.split(r"\n\s*\n", text):
+            passage = passage.strip()
+            if passage:
+                passages.append(passage)
+    return passages
+
+def _shingles(text: str, size: int = 5):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def deduplicate(passages, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+    """
+    Drops exact duplicates (normalized hash) and near duplicates (Jaccard
+    similarity of word 5-grams >= threshold). The first occurrence wins, so
+    plan order is preserved.
+    """
+    seen_hashes = set()
+    kept, kept_shingles = [], []
+    for passage in passages:
+        digest = hashlib.sha1(" ".join(passage.lower().split()).encode("utf-8")).hexdigest()
+        if digest in seen_hashes:
+            continue
+        seen_hashes.add(digest)
+
+        shingles = _shingles(passage)
+        if any(len(shingles & other) / len(shingles | other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+# 3. Map-reduce summarization (only used when the notes exceed the budget)
+summarizer_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     """
+You condense raw research notes for a report writer.
+Keep every fact, figure, date, name and source.
+Drop repetition, boilerplate and navigation text.
+Do not add information. Do not draw conclusions.
+Return plain text notes of at most {max_words} words.
+"""
+    ),
+    ("user", "Research Notes:\n{notes}")
+])
+
+@lru_cache(maxsize=1)
+def get_summarizer():
+    return RateLimited(summarizer_prompt | get_chat_model("gpt-4o-mini", temperature=0) | StrOutputParser())
+
+def _group(passages, max_tokens: int):
+    groups, current, size = [], [], 0
+    for passage in passages:
+        tokens = count_tokens(passage)
+        if current and size + tokens > max_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(truncate_tokens(passage, max_tokens))
+        size += min(tokens, max_tokens)
+    if current:
+        groups.append(current)
+    return groups
+
+def _map_inputs(passages, budget: int):
+    groups = _group(passages, MAP_GROUP_TOKENS)
+    # Every group gets an equal share of the budget (~0.75 words per token)
+    max_words = max(50, int(budget / len(groups) * 0.75))
+    return [{"notes": "\n\n".join(group), "max_words": max_words} for group in groups]
+
+def _fits(passages, budget: int) -> bool:
+    return count_tokens("\n\n".join(passages)) <= budget
+
+def compact_context(texts, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Turns the collected context into reporter input of at most 'budget' tokens:
+    deduplicate first, then map-reduce summarize if it still does not fit.
+    """
+    passages = deduplicate(split_passages(texts))
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if _fits(passages, budget):
+            break
+        print(f"    🗜️ Context over budget ({budget} tokens), summarizing...")
+        # Map: summarize groups of passages in parallel
+        passages = get_summarizer().batch(_map_inputs(passages, budget))
+    return truncate_tokens("\n\n".join(passages), budget)
+
+async def acompact_context(texts, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Async version of compact_context."""
+    passages = deduplicate(split_passages(texts))
+    for _ in range(MAX_REDUCE_ROUNDS):
+        if _fits(passages, budget):
+            break
+        print(f"    🗜️ Context over budget ({budget} tokens), summarizing...")
+        passages = await get_summarizer().abatch(_map_inputs(passages, budget))
+    return truncate_tokens("\n\n".join(passages), budget)
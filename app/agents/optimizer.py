@@ -0,0 +1,89 @@
+import os
+from typing import List
+import numpy as np
+from app.rag.embeddings import get_embeddings
+
+# Configuration
+# Steps whose embeddings are at least this similar are near-duplicates: one of them is kept
+PLAN_MERGE_THRESHOLD = float(os.getenv("PLAN_MERGE_THRESHOLD", "0.85"))
+# Most steps a plan may have; beyond that the closest steps are combined into one
+PLAN_MAX_STEPS = int(os.getenv("PLAN_MAX_STEPS", "8"))
+
+# Every plan step costs one LLM call and one search: merging redundant steps
+# before the researcher runs saves both.
+
+def _normalize(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def merge_steps(steps: List[str], vectors, threshold: float = PLAN_MERGE_THRESHOLD,
+                max_steps: int = PLAN_MAX_STEPS) -> List[str]:
+    """
+    Clusters the steps by embedding (closest pair of clusters first, compared by
+    centroid) until no pair is at least 'threshold' similar and at most
+    'max_steps' remain.
+
+    A near-duplicate is dropped in favour of the earliest step of its cluster.
+    Steps that are only combined to respect max_steps keep their text, joined
+    with "; ", so no research topic is lost. Plan order is preserved.
+    """
+    matrix = _normalize(vectors)
+    # Each cluster: [member indices (sorted), texts to keep]
+    clusters = [[[i], [step]] for i, step in enumerate(steps)]
+    while len(clusters) > 1:
+        centroids = _normalize([matrix[members].mean(axis=0) for members, _ in clusters])
+        similarity = centroids @ centroids.T
+        np.fill_diagonal(similarity, -np.inf)
+        a, b = sorted(np.unravel_index(int(np.argmax(similarity)), similarity.shape))
+        duplicate = similarity[a, b] >= threshold
+        if not duplicate and len(clusters) <= max_steps:
+            break
+        # Merge the later cluster into the earlier one (a < b keeps plan order)
+        members, texts = clusters.pop(b)
+        clusters[a][0] = sorted(clusters[a][0] + members)
+        if duplicate and len(texts) == 1:
+            print(f"    🧹 Merged duplicate step: '{texts[0]}' -> '{clusters[a][1][0]}'")
+        else:
+            clusters[a][1] = clusters[a][1] + texts
+            print(f"    🧹 Combined steps (max {max_steps}): '{texts[0]}' -> '{clusters[a][1][0]}'")
+    return ["; ".join(texts) for _, texts in clusters]
+
+def optimize_plan(steps: List[str], threshold: float = PLAN_MERGE_THRESHOLD,
+                  max_steps: int = PLAN_MAX_STEPS) -> List[str]:
+    """Deduplicates and caps the plan (one embedding request for all steps)."""
+    if len(steps) <= 1:
+        return list(steps)
+    try:
+        vectors = get_embeddings().embed_documents(steps)
+    except Exception as e:
+        # Optimizing is optional: keep the plan, only capped
+        print(f"⚠️ Plan optimization skipped ({e.__class__.__name__}), keeping the first {max_steps} steps.")
+        return list(steps[:max_steps])
+    return merge_steps(steps, vectors, threshold, max_steps)
+
+async def aoptimize_plan(steps: List[str], threshold: float = PLAN_MERGE_THRESHOLD,
+                         max_steps: int = PLAN_MAX_STEPS) -> List[str]:
+    """Async version of optimize_plan."""
+    if len(steps) <= 1:
+        return list(steps)
+    try:
+        vectors = await get_embeddings().aembed_documents(steps)
+    except Exception as e:
+        print(f"⚠️ Plan optimization skipped ({e.__class__.__name__}), keeping the first {max_steps} steps.")
+        return list(steps[:max_steps])
+    return merge_steps(steps, vectors, threshold, max_steps)
+
+# Node Functions (between the Planner and the Researcher)
+def optimize_node(state):
+    print("--- PLAN OPTIMIZER: Merging Duplicate Steps ---")
+
+    plan = optimize_plan(state["plan"])
+    print(f"    📋 {len(state['plan'])} planned steps -> {len(plan)} to research")
+    return {"plan": plan}
+
+async def aoptimize_node(state):
+    print("--- PLAN OPTIMIZER: Merging Duplicate Steps ---")
+
+    plan = await aoptimize_plan(state["plan"])
+    print(f"    📋 {len(state['plan'])} planned steps -> {len(plan)} to research")
+    return {"plan": plan}
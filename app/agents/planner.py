@@ -1,7 +1,9 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from typing import List
+from app.utils.clients import get_chat_model
+from app.utils.rate_limit import RateLimited
 
 # 1. Define the Structure (Schema)
 # This forces the LLM to give us a specific list, not random text.
@@ -11,11 +13,7 @@ class Plan(BaseModel):
         description="different steps to follow, should be in sorted order"
     )
 
-# 2. Initialize the Model
-# We use 'model="gpt-4o"' for best reasoning capabilities.
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-
-# 3. Create the Prompt
+# 2. Create the Prompt
 # This tells the AI how to think like a Research Manager.
 planner_prompt = ChatPromptTemplate.from_messages([
     (
@@ -187,11 +185,14 @@ You design research workflows.
     ("user", "{input}")
 ])
 
-# 4. Bind the Structure to the Model
+# 3. Bind the Structure to the Model
 # We tell the LLM: "Your output MUST match the 'Plan' class format."
-planner = planner_prompt | llm.with_structured_output(Plan)
+# Built on first use with the shared client, so importing the module stays cheap.
+@lru_cache(maxsize=1)
+def get_planner():
+    return RateLimited(planner_prompt | get_chat_model("gpt-4o-mini", temperature=0.2).with_structured_output(Plan))
 
-# 5. Define the Node Function for LangGraph
+# 4. Define the Node Function for LangGraph
 # This function receives the current State, runs the planner, and saves the result.
 def plan_node(state):
     print("--- PLANNER AGENT: Generating Research Plan ---")
@@ -200,7 +201,15 @@ def plan_node(state):
     task = state["task"]
     
     # Generate the plan
-    result = planner.invoke({"input": task})
+    result = get_planner().invoke({"input": task})
     
     # Return the updated state (saving the plan)
-    return {"plan": result.steps}
\ No newline at end of file
+    return {"plan": result.steps}
+
+# Async version of the node (used by graph.astream)
+async def aplan_node(state):
+    print("--- PLANNER AGENT: Generating Research Plan ---")
+    
+    result = await get_planner().ainvoke({"input": state["task"]})
+    
+    return {"plan": result.steps}
@@ -1,11 +1,12 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from app.graphs.state import context_texts
+from app.agents.compactor import compact_context, acompact_context
+from app.utils.clients import get_chat_model
+from app.utils.rate_limit import RateLimited
 
-# 1. Setup the LLM
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-
-# 2. Create the Prompt
+# 1. Create the Prompt
 # We tell the AI to act like a professional analyst.
 reporter_prompt = ChatPromptTemplate.from_messages([
     ("system", 
@@ -145,11 +146,21 @@ Only the final report.
      "Generate the final structured research report in Markdown:")
 ])
 
-# 3. Create the Chain
+# 2. Create the Chain
 # We use StrOutputParser because we just want a clean string (the report text), not a JSON object.
-reporter = reporter_prompt | llm | StrOutputParser()
-
-# 4. The Node Function
+# The tag marks the report tokens in the graph's "messages" stream, so callers can
+# stream the report without picking up tokens of other LLM calls (e.g. compaction).
+REPORT_STREAM_TAG = "report"
+# Completion tokens reserved from the shared token quota per report
+REPORT_COMPLETION_TOKENS = 2000
+# Built on first use with the shared client, so importing the module stays cheap.
+@lru_cache(maxsize=1)
+def get_reporter():
+    llm = get_chat_model("gpt-4o-mini", temperature=0.2)
+    chain = RateLimited(reporter_prompt | llm | StrOutputParser(), completion_tokens=REPORT_COMPLETION_TOKENS)
+    return chain.with_config(tags=[REPORT_STREAM_TAG])
+
+# 3. The Node Function
 def reporter_node(state):
     print("--- REPORTER AGENT: Writing Final Report ---")
     
@@ -157,11 +168,22 @@ def reporter_node(state):
     task = state["task"]
     context = state["context"]
     
-    # Convert list of search results into one big string
-    context_str = "\n\n".join(context)
+    # Convert list of search results into one string that fits the token budget
+    # (duplicates removed, summarized when still too long)
+    context_str = compact_context(context_texts(context))
     
     # Generate the report
-    final_report = reporter.invoke({"task": task, "context": context_str})
+    final_report = get_reporter().invoke({"task": task, "context": context_str})
     
     # Save the report to the state
-    return {"report": final_report}
\ No newline at end of file
+    return {"report": final_report}
+
+# Async version of the node (used by graph.astream)
+async def areporter_node(state):
+    print("--- REPORTER AGENT: Writing Final Report ---")
+    
+    context_str = await acompact_context(context_texts(state["context"]))
+    
+    final_report = await get_reporter().ainvoke({"task": state["task"], "context": context_str})
+    
+    return {"report": final_report}
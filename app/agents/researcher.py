@@ -1,22 +1,36 @@
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from typing import Literal
 from datetime import datetime
+import asyncio
+import threading
 
 # Import both tools
-from app.tools.search import search_tool
-from app.tools.retrieve import retrieve_tool
+from app.tools.search import search_tool, asearch_tool
+from app.tools.retrieve import retrieve_tool, aretrieve_tool, normalize_query
+from app.utils.cache import SqliteTTLCache
+from app.utils.clients import get_chat_model
+from app.utils.rate_limit import RateLimited
+from app.utils.telemetry import record_cache
+
+# Step memo: routing decision + tool result of every executed plan step,
+# keyed on the normalized step text and the day it ran
+STEP_MEMO_PATH = "data/step_memo.db"
+STEP_MEMO_MAX_ENTRIES = 5000
+STEP_MEMO_TTL = 24 * 3600
+# Results of realtime steps go stale much faster
+STEP_MEMO_REALTIME_TTL = 15 * 60
 
 # 1. Update Schema
 class ResearchStep(BaseModel):
     search_query: str = Field(..., description="The search query optimized for the source")
     source: Literal['web', 'local'] = Field(..., description="Where to look? 'local' or 'web'")
+    query_type: Literal['general', 'specific', 'realtime', 'deep'] = Field(
+        "general", description="Intent of the query: 'general', 'specific', 'realtime' or 'deep'"
+    )
 
-# 2. Setup LLM
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-# 3. YOUR FULL ORIGINAL PROMPT (Fixed with {{ }} for JSON)
+# 2. YOUR FULL ORIGINAL PROMPT (Fixed with {{ }} for JSON)
 query_prompt = ChatPromptTemplate.from_messages([
     ("system",
      """
@@ -106,35 +120,125 @@ You are a research engine. Your goal is finding high-quality information.
     ("user", "Research Step: {step}\n\nDecision (JSON):")
 ])
 
-# 4. Chain
-query_generator = query_prompt | llm.with_structured_output(ResearchStep)
+# 3. Chain
+# Built on first use with the shared client, so importing the module stays cheap.
+@lru_cache(maxsize=1)
+def get_query_generator():
+    return RateLimited(query_prompt | get_chat_model("gpt-4o-mini", temperature=0).with_structured_output(ResearchStep))
+
+# 4. Run a single plan step (shared by the sequential and the parallel graph)
+_memo = None
+_memo_lock = threading.Lock()
+
+def get_step_memo() -> SqliteTTLCache:
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = SqliteTTLCache(STEP_MEMO_PATH, max_entries=STEP_MEMO_MAX_ENTRIES, table="step_results")
+    return _memo
+
+def _memo_key(step: str, today_str: str) -> str:
+    return f"{today_str}|{normalize_query(step)}"
+
+def _remember_step(key: str, decision: ResearchStep, result: str):
+    ttl = STEP_MEMO_REALTIME_TTL if decision.query_type == "realtime" else STEP_MEMO_TTL
+    get_step_memo().set(key, {**decision.model_dump(), "result": result}, ttl=ttl)
 
-# 5. The Node Function
+def execute_step(step: str) -> str:
+    # --- GET DATE ---
+    today_str = datetime.now().strftime("%Y-%m-%d")
+
+    # Already executed today (retry, resumed run or overlapping plan)?
+    key = _memo_key(step, today_str)
+    memo = get_step_memo().get(key)
+    record_cache("step_memo", memo is not None)
+    if memo is not None:
+        print(f"    ♻️ Reusing result of step: '{step}'")
+        return memo["result"]
+
+    # --- INVOKE WITH DATE ---
+    decision = get_query_generator().invoke({
+        "step": step,
+        "CURRENT_DATE": today_str
+    })
+    
+    # Execute Logic
+    if decision.source == "local":
+        result = retrieve_tool(decision.search_query)
+    else:
+        result = search_tool(decision.search_query, realtime=decision.query_type == "realtime")
+
+    _remember_step(key, decision, result)
+    return result
+
+# 5. The Node Function (sequential mode: one step per call)
 def research_node(state):
     plan = state["plan"]
     current_step_index = state.get("current_step", 0)
     
     if current_step_index >= len(plan):
-        return {"content": []}
+        return {"context": []}
 
-    current_task = plan[current_step_index]
+    result = execute_step(plan[current_step_index])
     
-    # --- GET DATE ---
+    return {
+        "context": [{"step": current_step_index, "content": result}], 
+        "current_step": current_step_index + 1
+    }
+
+# 6. The Fan-out Node Function (parallel mode: one task per plan step)
+# Receives a StepState sent by the graph instead of the full AgentState.
+def research_step_node(state):
+    step_index = state["step_index"]
+    print(f"--- RESEARCHER AGENT: Step {step_index + 1} ---")
+    
+    result = execute_step(state["step"])
+    
+    return {"context": [{"step": step_index, "content": result}]}
+
+# 7. Async versions (used by graph.astream)
+async def aexecute_step(step: str) -> str:
     today_str = datetime.now().strftime("%Y-%m-%d")
 
-    # --- INVOKE WITH DATE ---
-    decision = query_generator.invoke({
-        "step": current_task,
+    key = _memo_key(step, today_str)
+    memo = await asyncio.to_thread(get_step_memo().get, key)
+    record_cache("step_memo", memo is not None)
+    if memo is not None:
+        print(f"    ♻️ Reusing result of step: '{step}'")
+        return memo["result"]
+
+    decision = await get_query_generator().ainvoke({
+        "step": step,
         "CURRENT_DATE": today_str
     })
     
-    # Execute Logic
     if decision.source == "local":
-        result = retrieve_tool(decision.search_query) 
+        result = await aretrieve_tool(decision.search_query)
     else:
-        result = search_tool(decision.search_query)
+        result = await asearch_tool(decision.search_query, realtime=decision.query_type == "realtime")
+
+    await asyncio.to_thread(_remember_step, key, decision, result)
+    return result
+
+async def aresearch_node(state):
+    plan = state["plan"]
+    current_step_index = state.get("current_step", 0)
+    
+    if current_step_index >= len(plan):
+        return {"context": []}
+
+    result = await aexecute_step(plan[current_step_index])
     
     return {
-        "context": [result], 
+        "context": [{"step": current_step_index, "content": result}], 
         "current_step": current_step_index + 1
-    }
\ No newline at end of file
+    }
+
+async def aresearch_step_node(state):
+    step_index = state["step_index"]
+    print(f"--- RESEARCHER AGENT: Step {step_index + 1} ---")
+    
+    result = await aexecute_step(state["step"])
+    
+    return {"context": [{"step": step_index, "content": result}]}
@@ -1,10 +1,10 @@
 from dotenv import load_dotenv
 load_dotenv() # Load API key
 
-from app.agents.planner import planner
+from app.agents.planner import get_planner
 
 # Test prompt
-response = planner.invoke({"input": "Research the impact of Quantum Computing on Cybersecurity."})
+response = get_planner().invoke({"input": "Research the impact of Quantum Computing on Cybersecurity."})
 
 print("Generated Plan:")
 for i, step in enumerate(response.steps):
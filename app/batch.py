@@ -0,0 +1,163 @@
+"""
+Batch research: many topics, one process, shared caches.
+
+Input is a JSONL file with one topic per line, either {"topic": "...", "id": "..."}
+("id" optional, defaults to a hash of the topic) or a plain JSON string.
+Every finished run is appended to the output JSONL as soon as it is done:
+  {"id", "topic", "status": "done" | "failed", "report", "plan", "seconds",
+   "timings", "thread_id", "error"}
+Re-running with the same output file skips topics that already have a "done"
+line; failed topics are retried and resume from their last checkpoint, so
+a topic can have several lines (the last one is its current result).
+
+All runs share the process-wide retriever, search cache, step memo, report
+cache and LLM clients.
+
+Usage:
+  python -m app.batch topics.jsonl results.jsonl --concurrency 8
+"""
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+load_dotenv()
+
+from app.main import astream_research, new_config
+from app.graphs.graph import graph
+from app.utils.telemetry import configure_metrics, summarize
+
+# Configuration
+# Research runs in flight at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+def topic_id(topic: str) -> str:
+    return hashlib.sha256(topic.encode("utf-8")).hexdigest()[:16]
+
+def load_topics(path: str):
+    """[(id, topic)] from a JSONL file (objects with "topic", or plain strings)."""
+    topics = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"topic": item}
+            if not item.get("topic"):
+                raise ValueError(f"{path}:{line_no}: missing 'topic'")
+            topics.append((str(item.get("id") or topic_id(item["topic"])), item["topic"]))
+    return topics
+
+def load_finished(path: str) -> set:
+    """Ids that already have a successful result in the output file."""
+    finished = set()
+    if not os.path.exists(path):
+        return finished
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut off by a crash: that topic simply runs again
+                continue
+            if result.get("status") == "done":
+                finished.add(result["id"])
+    return finished
+
+async def run_topic(item_id: str, topic: str, use_cache: bool = True) -> dict:
+    # Deterministic thread per id and topic: a retried topic resumes from its
+    # checkpoint, while an id reused for another topic (e.g. "1" in another
+    # input file) never lands on that topic's thread
+    topic_key = topic_id(topic)
+    thread_id = f"batch-{item_id}" if item_id == topic_key else f"batch-{item_id}-{topic_key}"
+    config = new_config(thread_id)
+    resume = bool((await graph.aget_state(config)).next)
+
+    started = time.perf_counter()
+    result = {"id": item_id, "topic": topic, "status": "done", "report": "", "plan": None,
+              "seconds": 0.0, "timings": {}, "thread_id": thread_id, "error": None}
+    telemetry = []
+    try:
+        async for event in astream_research(topic, config=config, resume=resume, use_cache=use_cache):
+            if event[0] == "telemetry":
+                telemetry.append(event[1])
+            elif event[0] == "update":
+                _, key, value = event
+                if key in ("planner", "optimizer"):
+                    # The optimized plan (after the planner's) is what was researched
+                    result["plan"] = value.get("plan")
+                elif key == "reporter":
+                    result["report"] = value.get("report", "")
+        if result["plan"] is None:
+            # Resumed run: the plan was made before the interruption
+            result["plan"] = (await graph.aget_state(config)).values.get("plan")
+    except Exception as e:
+        result.update(status="failed", error=str(e))
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["timings"] = summarize(telemetry)
+    return result
+
+async def run_batch(input_path: str, output_path: str, concurrency: int = BATCH_CONCURRENCY,
+                    use_cache: bool = True) -> dict:
+    """Runs every unfinished topic of input_path; returns {"done", "failed", "skipped"} counts."""
+    topics = load_topics(input_path)
+    finished = load_finished(output_path)
+    # One run per id: a repeated topic (or id) would run twice on the same checkpoint thread
+    pending, seen = [], set(finished)
+    for item_id, topic in topics:
+        if item_id not in seen:
+            seen.add(item_id)
+            pending.append((item_id, topic))
+    duplicates = len(topics) - len({item_id for item_id, _ in topics})
+    if duplicates:
+        print(f"⚠️ {duplicates} duplicate id(s) in '{input_path}': only the first line of each runs")
+    counts = {"done": 0, "failed": 0, "skipped": len(topics) - len(pending)}
+    print(f"📦 {len(topics)} topics: {counts['skipped']} already done or duplicated, {len(pending)} to run "
+          f"({concurrency} at a time)")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(item_id, topic):
+        async with semaphore:
+            return await run_topic(item_id, topic, use_cache=use_cache)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as out:
+        tasks = [asyncio.create_task(worker(item_id, topic)) for item_id, topic in pending]
+        # Results are written in completion order, one line each, flushed right away
+        for future in asyncio.as_completed(tasks):
+            result = await future
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[result["status"]] += 1
+            icon = "✅" if result["status"] == "done" else "❌"
+            print(f"{icon} [{counts['done'] + counts['failed']}/{len(pending)}] "
+                  f"{result['topic'][:60]} ({result['seconds']:.1f}s)")
+
+    print(f"🎉 Batch finished: {counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped.")
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many research topics from a JSONL file.")
+    parser.add_argument("input", help="JSONL file of topics")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--no-cache", action="store_true", help="do not answer from the report cache")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print(" ERROR: OPENAI_API_KEY is missing! Check your .env file.")
+        return 1
+    configure_metrics()
+
+    counts = asyncio.run(run_batch(args.input, args.output, args.concurrency, use_cache=not args.no_cache))
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
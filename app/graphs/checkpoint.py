@@ -0,0 +1,278 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+# Configuration
+CHECKPOINT_DB = "data/checkpoints.db"
+# Checkpoints kept per thread (older ones and their writes are deleted)
+KEEP_LAST_CHECKPOINTS = int(os.getenv("CHECKPOINT_KEEP_LAST", "5"))
+# Threads without a new checkpoint for this long are deleted (seconds)
+THREAD_IDLE_TTL = int(os.getenv("CHECKPOINT_IDLE_TTL", str(3 * 24 * 3600)))
+# How often idle threads are looked for (seconds)
+EVICTION_INTERVAL = 600
+
+class SqliteSaver(BaseCheckpointSaver):
+    """
+    Disk-backed LangGraph checkpointer with bounded growth.
+
+    - Checkpoints and pending writes live in one SQLite file, so memory use
+      stays flat and interrupted runs can be resumed after a restart.
+    - Only the newest KEEP_LAST_CHECKPOINTS checkpoints of every thread are kept.
+    - Threads idle for longer than THREAD_IDLE_TTL are evicted.
+    Safe to share between threads (one connection guarded by a lock).
+    """
+
+    def __init__(self, path: str = CHECKPOINT_DB, keep_last: int = KEEP_LAST_CHECKPOINTS,
+                 idle_ttl: float = THREAD_IDLE_TTL, *, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_last = keep_last
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._open_lock = threading.Lock()
+        self._last_eviction = 0.0
+        self._db = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use: importing the graph must not create the database file
+        if self._db is None:
+            with self._open_lock:
+                if self._db is None:
+                    self._db = self._connect()
+        return self._db
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS threads_updated_at ON threads(updated_at);
+            """
+        )
+        conn.commit()
+        return conn
+
+    # --- Reading ---
+
+    def _to_tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata):
+        writes = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, value)))
+                for task_id, channel, w_type, value in writes
+            ],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                   "type, checkpoint, metadata_type, metadata FROM checkpoints ")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    columns + "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                # Checkpoint ids are time-ordered, so the largest one is the latest
+                row = self._conn.execute(
+                    columns + "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            return self._to_tuple(*row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                 "type, checkpoint, metadata_type, metadata FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            results = []
+            for row in rows:
+                item = self._to_tuple(*row)
+                # Metadata filters are applied after decoding
+                if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                results.append(item)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    # --- Writing ---
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, serialized, metadata_type, serialized_metadata),
+            )
+            self._conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, now))
+            self._apply_retention(thread_id, checkpoint_ns)
+            if now - self._last_eviction > EVICTION_INTERVAL:
+                self._evict_idle(now)
+            self._conn.commit()
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        replace_rows, insert_rows = [], []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id,
+                   WRITES_IDX_MAP.get(channel, idx), channel, type_, serialized, task_path)
+            # Special writes (errors, interrupts...) replace older ones; regular writes are stored once
+            (replace_rows if channel in WRITES_IDX_MAP else insert_rows).append(row)
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", replace_rows)
+            self._conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", insert_rows)
+            self._conn.commit()
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._delete_threads([thread_id])
+            self._conn.commit()
+
+    # --- Retention and compaction ---
+
+    def _apply_retention(self, thread_id, checkpoint_ns):
+        # Keep only the newest keep_last checkpoints (and their writes) of this thread
+        stale = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_last),
+        ).fetchall()
+        for (checkpoint_id,) in stale:
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+            self._conn.execute(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", key)
+
+    def _evict_idle(self, now):
+        self._last_eviction = now
+        idle = [row[0] for row in self._conn.execute(
+            "SELECT thread_id FROM threads WHERE updated_at < ?", (now - self.idle_ttl,)
+        ).fetchall()]
+        self._delete_threads(idle)
+        return len(idle)
+
+    def _delete_threads(self, thread_ids):
+        for thread_id in thread_ids:
+            for table in ("checkpoints", "writes", "threads"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def compact(self):
+        """
+        Applies the retention policy to every thread, evicts idle threads and
+        gives the freed pages back to the OS. Returns the number of evicted threads.
+        """
+        with self._lock:
+            evicted = self._evict_idle(time.time())
+            for thread_id, checkpoint_ns in self._conn.execute(
+                "SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints"
+            ).fetchall():
+                self._apply_retention(thread_id, checkpoint_ns)
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        return evicted
+
+    # --- Async versions (SQLite calls run in a worker thread) ---
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -1,48 +1,98 @@
+import os
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from app.graphs.state import AgentState
-from app.agents.planner import plan_node
-from app.agents.researcher import research_node
-from app.agents.reporter import reporter_node
+from langgraph.types import Send
+from langchain_core.runnables import RunnableLambda
+from app.graphs.state import AgentState, StepState
+from app.graphs.checkpoint import SqliteSaver
+from app.agents.planner import plan_node, aplan_node
+from app.agents.optimizer import optimize_node, aoptimize_node
+from app.agents.researcher import research_node, aresearch_node, research_step_node, aresearch_step_node
+from app.agents.reporter import reporter_node, areporter_node
+from app.utils.telemetry import instrument_node
 
-# 1. Initialize Graph
-workflow = StateGraph(AgentState)
-
-# 2. Add Nodes (No Analyst)
-workflow.add_node("planner", plan_node)
-workflow.add_node("researcher", research_node)
-workflow.add_node("reporter", reporter_node)
-
-# 3. Define Entry Point
-workflow.set_entry_point("planner")
-
-# 4. Simple Logic Flow
-# Planner -> Researcher
-workflow.add_edge("planner", "researcher")
+# Configuration
+# "parallel": every plan step runs as its own researcher task, joined before the reporter.
+# "sequential": the researcher loops over the plan one step at a time.
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "parallel")
+# Maximum number of researcher tasks running at the same time (parallel mode)
+MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY", "4"))
 
 # Researcher Loop: Check if more steps are needed
 def should_continue(state):
     current_step = state.get("current_step", 0)
     plan = state["plan"]
-    
+
     # If all steps are done -> Reporter. Else -> Researcher again.
     if current_step >= len(plan):
         return "reporter"
     else:
         return "researcher"
 
-workflow.add_conditional_edges(
-    "researcher",
-    should_continue,
-    {
-        "researcher": "researcher",
-        "reporter": "reporter"
-    }
-)
+# Fan-out: one researcher task per plan step
+def fan_out_steps(state):
+    plan = state["plan"]
+
+    # Nothing to research -> go straight to the Reporter
+    if not plan:
+        return "reporter"
+
+    return [
+        Send("researcher", {"task": state["task"], "step": step, "step_index": i})
+        for i, step in enumerate(plan)
+    ]
+
+def _node(name, fn, afn):
+    return RunnableLambda(instrument_node(name, fn), afunc=instrument_node(name, afn), name=name)
+
+def build_workflow(mode: str = RESEARCH_MODE):
+    # 1. Initialize Graph
+    workflow = StateGraph(AgentState)
+
+    # 2. Add Nodes (No Analyst)
+    # Every node has a sync and an async version: graph.stream uses the first,
+    # graph.astream the second. Both are timed and emit a telemetry event.
+    workflow.add_node("planner", _node("planner", plan_node, aplan_node))
+    # Merges near-duplicate plan steps (and caps their number) before any research starts
+    workflow.add_node("optimizer", _node("optimizer", optimize_node, aoptimize_node))
+    if mode == "parallel":
+        workflow.add_node(
+            "researcher",
+            _node("researcher", research_step_node, aresearch_step_node),
+            input_schema=StepState,
+        )
+    else:
+        workflow.add_node("researcher", _node("researcher", research_node, aresearch_node))
+    workflow.add_node("reporter", _node("reporter", reporter_node, areporter_node))
+
+    # 3. Define Entry Point
+    workflow.set_entry_point("planner")
+
+    # 4. Logic Flow
+    workflow.add_edge("planner", "optimizer")
+    if mode == "parallel":
+        # Planner -> Optimizer -> N x Researcher (in parallel) -> Reporter
+        # The Reporter only runs once every researcher task has finished.
+        workflow.add_conditional_edges("optimizer", fan_out_steps, ["researcher", "reporter"])
+        workflow.add_edge("researcher", "reporter")
+    else:
+        # Planner -> Optimizer -> Researcher -> Researcher ... -> Reporter
+        workflow.add_edge("optimizer", "researcher")
+        workflow.add_conditional_edges(
+            "researcher",
+            should_continue,
+            {
+                "researcher": "researcher",
+                "reporter": "reporter"
+            }
+        )
 
-# Reporter -> End
-workflow.add_edge("reporter", END)
+    # Reporter -> End
+    workflow.add_edge("reporter", END)
+    return workflow
 
 # 5. Compile
-memory = MemorySaver()
-graph = workflow.compile(checkpointer=memory)
\ No newline at end of file
+# Checkpoints go to SQLite (bounded per thread, idle threads evicted), so
+# memory stays flat and interrupted runs can be resumed by thread id.
+# max_concurrency caps how many researcher tasks run at once.
+checkpointer = SqliteSaver()
+graph = build_workflow().compile(checkpointer=checkpointer).with_config(max_concurrency=MAX_CONCURRENCY)
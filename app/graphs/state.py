@@ -1,14 +1,62 @@
-from typing import Annotated, List, TypedDict
-import operator
+from typing import Annotated, List, TypedDict, Union
+
+
+class StepResult(TypedDict):
+    # Index of the plan step that produced this result
+    step: int
+    # The text returned by the search/retrieve tool
+    content: str
+
+
+# First 'context' entry of a fresh run: drops what an earlier run on the
+# same thread collected (an empty list would be merged, not replace it)
+RESET_CONTEXT = {"reset": True}
+
+
+def merge_context(left: List[Union[StepResult, str]], right: List[Union[StepResult, str]]):
+    """
+    Reducer for 'context': keeps research results in plan order.
+
+    Parallel researcher tasks finish in any order, so every result carries the
+    index of its plan step. Results for the same step replace each other (the
+    newest one wins) and the merged list is always sorted by step index.
+    Plain strings are still accepted and are kept after the indexed results.
+    A RESET_CONTEXT entry discards everything merged before it.
+    """
+    right = list(right or [])
+    if RESET_CONTEXT in right:
+        left = []
+        right = right[right.index(RESET_CONTEXT) + 1:]
+    indexed = {}
+    extra = []
+    for item in list(left or []) + right:
+        if isinstance(item, dict):
+            indexed[item["step"]] = item
+        else:
+            extra.append(item)
+    return [indexed[i] for i in sorted(indexed)] + extra
+
+
+def context_texts(context: List[Union[StepResult, str]]) -> List[str]:
+    """Returns the plain text of every context entry, in plan order."""
+    return [item["content"] if isinstance(item, dict) else item for item in context or []]
+
 
 class AgentState(TypedDict):
     # The original user goal
     task: str
     # The plan generated by the Planner
     plan: List[str]
-    # Collected research data
-    context: Annotated[List[str], operator.add]
+    # Collected research data (one entry per plan step, kept in plan order)
+    context: Annotated[List[StepResult], merge_context]
     # The final report
     report: str
     # Current step in the plan
-    current_step: int
\ No newline at end of file
+    current_step: int
+
+
+class StepState(TypedDict):
+    # Input of a single fanned-out researcher task
+    task: str
+    step: str
+    step_index: int
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.main import can_resume, new_config, stream_research
+
+# Configuration
+# Research runs executing at the same time (each one fans out its own steps)
+JOB_WORKERS = int(os.getenv("RESEARCH_JOB_WORKERS", "4"))
+# Jobs allowed to wait for a worker; submit() raises QueueFullError beyond that
+JOB_QUEUE_SIZE = int(os.getenv("RESEARCH_JOB_QUEUE_SIZE", "100"))
+# Finished jobs are kept this long for the UI to pick up their result (seconds)
+JOB_RETENTION = 3600
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class QueueFullError(RuntimeError):
+    """Too many jobs are already waiting for a worker."""
+
+class Job:
+    """One research run executing in the background; updated by its worker thread."""
+
+    def __init__(self, topic: str, thread_id: str):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.thread_id = thread_id
+        self.status = "queued"          # queued -> running -> done | failed | cancelled
+        self.stage = "Waiting for a free worker..."
+        self.steps_done = 0
+        self.report = ""
+        self.telemetry = []
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        # Everything that happened, in order: (type, data) pairs for subscribers
+        self.events = []
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the job's state, safe to read from another thread."""
+        with self._lock:
+            return {
+                "id": self.id, "topic": self.topic, "thread_id": self.thread_id,
+                "status": self.status, "stage": self.stage, "steps_done": self.steps_done,
+                "report": self.report, "telemetry": list(self.telemetry), "error": self.error,
+                "created_at": self.created_at, "finished_at": self.finished_at,
+                "cancel_requested": self.cancel_requested,
+            }
+
+    def events_since(self, index: int):
+        """Events published after the first 'index' ones (for streaming them to a client)."""
+        with self._lock:
+            return self.events[index:]
+
+    def _update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if "status" in fields:
+                self.events.append(("status", {"status": self.status, "stage": self.stage, "error": self.error}))
+
+    def _publish(self, kind: str, data):
+        with self._lock:
+            self.events.append((kind, data))
+
+class JobManager:
+    """
+    Runs research jobs on a worker pool, outside any request or Streamlit rerun.
+
+    Jobs are keyed by checkpoint thread id: submitting again for a thread whose
+    job is still queued or running returns that job instead of starting a
+    second run. A failed or cancelled job resubmitted for the same thread
+    resumes from its last checkpoint. At most queue_size jobs wait for a
+    worker at any time.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, retention: float = JOB_RETENTION,
+                 queue_size: int = JOB_QUEUE_SIZE):
+        self.retention = retention
+        self.queue_size = queue_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="research-job")
+        self._jobs = {}
+        self._by_thread = {}
+        self._lock = threading.Lock()
+
+    def submit(self, topic: str, thread_id: str = None) -> Job:
+        thread_id = thread_id or uuid.uuid4().hex
+        with self._lock:
+            self._forget_old()
+            current = self._jobs.get(self._by_thread.get(thread_id))
+            if current is not None and current.active:
+                return current
+            if self.counts()["queued"] >= self.queue_size:
+                raise QueueFullError(f"{self.queue_size} research jobs are already waiting")
+            job = Job(topic, thread_id)
+            self._jobs[job.id] = job
+            self._by_thread[thread_id] = job.id
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def job_for_thread(self, thread_id: str):
+        with self._lock:
+            return self._jobs.get(self._by_thread.get(thread_id))
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Asks a job to stop: a queued job never starts, a running one stops after
+        the event it is processing. Returns False when the job is unknown or finished.
+        """
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        if job.status == "queued":
+            # Finished right away: no need to wait for a worker to pick it up
+            job._update(cancel_requested=True, status="cancelled", stage="Cancelled", finished_at=time.time())
+        else:
+            job._update(cancel_requested=True)
+        return True
+
+    def cancel_all(self) -> int:
+        """Cancels every active job (e.g. on shutdown). Returns how many were cancelled."""
+        with self._lock:
+            active = [job.id for job in self._jobs.values() if job.active]
+        return sum(self.cancel(job_id) for job_id in active)
+
+    def counts(self) -> dict:
+        counts = {"queued": 0, "running": 0}
+        for job in list(self._jobs.values()):
+            if job.status in counts:
+                counts[job.status] += 1
+        return counts
+
+    def _forget_old(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            job = self._jobs.pop(job_id)
+            if self._by_thread.get(job.thread_id) == job_id:
+                del self._by_thread[job.thread_id]
+
+    def _run(self, job: Job):
+        if job.cancel_requested:
+            if job.status != "cancelled":
+                job._update(status="cancelled", stage="Cancelled", finished_at=time.time())
+            return
+        config = new_config(job.thread_id)
+        events = None
+        try:
+            # Continue an interrupted run of this thread instead of starting over
+            resume = can_resume(config)
+            job._update(status="running", stage="Resuming from the last checkpoint..." if resume else "Planning...")
+            events = stream_research(job.topic, config=config, resume=resume)
+            for event in events:
+                if job.cancel_requested:
+                    # Stop here; the checkpoint keeps the finished steps for a later resume
+                    job._update(status="cancelled", stage="Cancelled", finished_at=time.time())
+                    return
+                if event[0] == "token":
+                    with job._lock:
+                        job.report += event[1]
+                    job._publish("token", event[1])
+                elif event[0] == "telemetry":
+                    with job._lock:
+                        job.telemetry.append(event[1])
+                    job._publish("telemetry", event[1])
+                else:
+                    self._on_update(job, event[1], event[2])
+            job._update(status="done", stage="Finished", finished_at=time.time())
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job._update(status="failed", stage="Failed", error=str(e), finished_at=time.time())
+        finally:
+            if events is not None:
+                events.close()
+
+    def _on_update(self, job: Job, key: str, value: dict):
+        # Subscribers get a compact summary of the node, not the raw state update
+        summary = {"node": key}
+        if "plan" in value:
+            summary["plan"] = value["plan"]
+        with job._lock:
+            if key == "planner":
+                job.stage = "Plan drafted. Merging duplicate steps..."
+            elif key == "optimizer":
+                job.stage = f"Plan validated ({len(value.get('plan', []))} steps). Gathering intelligence..."
+            elif key == "researcher":
+                # Steps may finish out of order when they run in parallel
+                job.steps_done += 1
+                job.stage = f"Gathering intelligence... ({job.steps_done} steps done)"
+            elif key == "reporter":
+                job.stage = "Report written"
+                # The final text (also when the report was not streamed token by token)
+                job.report = value.get("report", job.report)
+            summary["stage"] = job.stage
+            summary["steps_done"] = job.steps_done
+        job._publish("node", summary)
+
+# One pool per process, shared by every session
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager()
+    return _manager
@@ -1,32 +1,234 @@
 from dotenv import load_dotenv
+import asyncio
 import os
+import sys
+import uuid
 
 # 1. Load environment variables from .env file
 load_dotenv() 
 
-# Check if key is loaded
-if not os.getenv("OPENAI_API_KEY"):
-    print(" ERROR: OPENAI_API_KEY is missing! Check your .env file.")
-    exit(1)
-
 # 2. Import the graph
 from app.graphs.graph import graph
+from app.graphs.state import RESET_CONTEXT, context_texts
+from app.agents.reporter import REPORT_STREAM_TAG, get_reporter
+from app.agents.compactor import compact_context, acompact_context
+from app.utils.report_cache import REPORT_REUSE_THRESHOLD, get_report_cache
+from app.utils.telemetry import configure_metrics, record_cache, summarize
+
+def new_config(thread_id: str = None):
+    # Every run gets its own checkpoint thread (pass a thread id to resume one)
+    return {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
+
+def can_resume(config: dict) -> bool:
+    """True when the thread has a checkpointed run that did not finish."""
+    return bool(graph.get_state(config).next)
+
+def _initial_state(topic: str):
+    # A finished run on the same thread left its notes in the checkpoint: reset them
+    return {"task": topic, "current_step": 0, "context": [RESET_CONTEXT]}
+
+def _is_report_token(metadata) -> bool:
+    return REPORT_STREAM_TAG in metadata.get("tags", [])
+
+# --- Semantic report cache ---
+
+def _cache_lookup(topic: str):
+    try:
+        hit = get_report_cache().lookup(topic)
+        record_cache("report", hit is not None)
+        return hit
+    except Exception as e:
+        # The cache only saves work: never fail a run because of it
+        print(f"⚠️ Report cache unavailable: {e}")
+        return None
+
+def _cache_store(config: dict):
+    try:
+        values = graph.get_state(config).values
+        if values.get("report"):
+            get_report_cache().add(values["task"], values["report"], context_texts(values.get("context", [])))
+    except Exception as e:
+        print(f"⚠️ Could not cache report: {e}")
+
+def _cached_report_events(topic: str, hit):
+    if hit.similarity >= REPORT_REUSE_THRESHOLD:
+        print(f"♻️ Reusing cached report (similarity {hit.similarity:.2f})")
+        yield ("token", hit.report)
+        yield ("update", "reporter", {"report": hit.report})
+        return
+
+    # Close enough: rewrite the report for this task from the cached research notes
+    print(f"♻️ Refreshing cached report (similarity {hit.similarity:.2f})")
+    parts = []
+    for token in get_reporter().stream({"task": topic, "context": compact_context(hit.context)}):
+        parts.append(token)
+        yield ("token", token)
+    report = "".join(parts)
+    get_report_cache().add(topic, report, hit.context)
+    yield ("update", "reporter", {"report": report})
+
+async def _acached_report_events(topic: str, hit):
+    if hit.similarity >= REPORT_REUSE_THRESHOLD:
+        print(f"♻️ Reusing cached report (similarity {hit.similarity:.2f})")
+        yield ("token", hit.report)
+        yield ("update", "reporter", {"report": hit.report})
+        return
+
+    print(f"♻️ Refreshing cached report (similarity {hit.similarity:.2f})")
+    parts = []
+    async for token in get_reporter().astream({"task": topic, "context": await acompact_context(hit.context)}):
+        parts.append(token)
+        yield ("token", token)
+    report = "".join(parts)
+    await asyncio.to_thread(get_report_cache().add, topic, report, hit.context)
+    yield ("update", "reporter", {"report": report})
 
-def run_research_agent(topic: str):
-    print(f"🚀 Starting research on: {topic}")
+# --- Running the graph ---
+
+def stream_research(topic: str, config: dict = None, resume: bool = False, use_cache: bool = True):
+    """
+    Runs the graph and yields events as they happen:
+      ("update", node_name, state_update)  when a node finishes
+      ("token", text)                      for every report token the reporter LLM generates
+      ("telemetry", event)                 timing/token/cache events (see app/utils/telemetry.py)
+    With resume=True the interrupted run of config's thread continues from
+    its last checkpoint instead of starting over (topic is ignored).
+    Near-duplicate tasks are answered from the semantic report cache.
+    """
+    config = config or new_config()
+    if not resume and use_cache:
+        hit = _cache_lookup(topic)
+        if hit is not None:
+            yield from _cached_report_events(topic, hit)
+            return
+
+    inputs = None if resume else _initial_state(topic)
+    stream = graph.stream(inputs, config=config, stream_mode=["updates", "messages", "custom"])
+    for mode, chunk in stream:
+        if mode == "updates":
+            for key, value in chunk.items():
+                yield ("update", key, value or {})
+        elif mode == "custom":
+            yield ("telemetry", chunk)
+        else:
+            message, metadata = chunk
+            if _is_report_token(metadata) and message.content:
+                yield ("token", message.content)
+
+    if use_cache:
+        _cache_store(config)
+
+async def astream_research(topic: str, config: dict = None, resume: bool = False, use_cache: bool = True):
+    """Async version of stream_research (uses graph.astream)."""
+    config = config or new_config()
+    if not resume and use_cache:
+        hit = await asyncio.to_thread(_cache_lookup, topic)
+        if hit is not None:
+            async for event in _acached_report_events(topic, hit):
+                yield event
+            return
+
+    inputs = None if resume else _initial_state(topic)
+    stream = graph.astream(inputs, config=config, stream_mode=["updates", "messages", "custom"])
+    async for mode, chunk in stream:
+        if mode == "updates":
+            for key, value in chunk.items():
+                yield ("update", key, value or {})
+        elif mode == "custom":
+            yield ("telemetry", chunk)
+        else:
+            message, metadata = chunk
+            if _is_report_token(metadata) and message.content:
+                yield ("token", message.content)
+
+    if use_cache:
+        await asyncio.to_thread(_cache_store, config)
+
+def _print_event(event, streaming: dict):
+    if event[0] == "telemetry":
+        streaming["telemetry"].append(event[1])
+    elif event[0] == "token":
+        if not streaming["started"]:
+            print("\n\n🔥 FINAL REPORT 🔥\n")
+            streaming["started"] = True
+        print(event[1], end="", flush=True)
+    else:
+        _, key, value = event
+        if streaming["started"]:
+            print()
+        print(f"✅ Finished Node: {key}")
+        # Report was not streamed token by token: print it whole
+        if "report" in value and not streaming["started"]:
+            print("\n\n🔥 FINAL REPORT 🔥\n")
+            print(value["report"])
+
+def _print_summary(events):
+    totals = summarize(events)
+    if not totals:
+        return
+    print("\n\n⏱️ Where the time went (node time is summed over parallel tasks):")
+    for node, row in totals.items():
+        print(f"   {node:<11} {row['runs']:>3}x  {row['seconds']:>7.1f}s  "
+              f"{row['prompt_tokens'] + row['completion_tokens']:>7} tokens  ${row['cost_usd']:.4f}  "
+              f"cache {row['cache_hits']}/{row['cache_hits'] + row['cache_misses']} hits")
+
+def run_research_agent(topic: str, thread_id: str = None):
+    """Runs (or, given the thread id of an interrupted run, resumes) a research task."""
+    config = new_config(thread_id)
+    resume = thread_id is not None and can_resume(config)
+    if thread_id and not resume and not topic:
+        print(f"⚠️ Thread {thread_id} has no unfinished run to resume.")
+        return
+    if resume:
+        print(f"🔁 Resuming research thread: {thread_id}")
+    else:
+        print(f"🚀 Starting research on: {topic}")
+    print(f"🧵 Thread: {config['configurable']['thread_id']}")
     
-    initial_state = {"task": topic, "current_step": 0, "context": []}
+    streaming = {"started": False, "telemetry": []}
+    try:
+        for event in stream_research(topic, config=config, resume=resume):
+            _print_event(event, streaming)
+    except Exception as e:
+        print(f"❌ Error during execution: {e}")
+    _print_summary(streaming["telemetry"])
+
+async def arun_research_agent(topic: str, thread_id: str = None):
+    """
+    Async version of run_research_agent (uses graph.astream).
+    Many runs can share one event loop, e.g. with asyncio.gather.
+    """
+    config = new_config(thread_id)
+    resume = thread_id is not None and bool((await graph.aget_state(config)).next)
+    if thread_id and not resume and not topic:
+        print(f"⚠️ Thread {thread_id} has no unfinished run to resume.")
+        return
+    if resume:
+        print(f"🔁 Resuming research thread: {thread_id}")
+    else:
+        print(f"🚀 Starting research on: {topic}")
+    print(f"🧵 Thread: {config['configurable']['thread_id']}")
     
+    streaming = {"started": False, "telemetry": []}
     try:
-        for event in graph.stream(initial_state):
-            for key, value in event.items():
-                print(f"✅ Finished Node: {key}")
-                if "report" in value:
-                    print("\n\n🔥 FINAL REPORT 🔥\n")
-                    print(value["report"])
+        async for event in astream_research(topic, config=config, resume=resume):
+            _print_event(event, streaming)
     except Exception as e:
         print(f"❌ Error during execution: {e}")
+    _print_summary(streaming["telemetry"])
 
 if __name__ == "__main__":
-    user_topic = input("📝 Enter a research topic: ")
-    run_research_agent(user_topic)
\ No newline at end of file
+    # Check if key is loaded
+    if not os.getenv("OPENAI_API_KEY"):
+        print(" ERROR: OPENAI_API_KEY is missing! Check your .env file.")
+        exit(1)
+
+    # Export metrics when OTEL_EXPORTER_OTLP_ENDPOINT (or TELEMETRY_CONSOLE=1) is set
+    configure_metrics()
+
+    # python -m app.main [THREAD_ID]  -> resume an interrupted run
+    if len(sys.argv) > 1:
+        asyncio.run(arun_research_agent("", thread_id=sys.argv[1]))
+    else:
+        user_topic = input("📝 Enter a research topic: ")
+        asyncio.run(arun_research_agent(user_topic))
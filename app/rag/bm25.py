@@ -0,0 +1,170 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+# Define paths
+INDEX_PATH = "data/bm25_index.json"
+# Chunks read per request when rebuilding the index from the vector store
+STORE_PAGE_SIZE = 1000
+
+# Words, plus compound tokens such as part numbers ("XR-2000", "v1.2") kept whole
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+
+def tokenize(text: str):
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+    return tokens
+
+class BM25Index:
+    """
+    Compact in-process inverted index with Okapi BM25 scoring.
+
+    Postings are plain dicts (term -> {doc: term frequency}) and the IDF of
+    every term is precomputed, so a query only touches the postings of its
+    own terms. Only chunk ids are stored, not the texts (those stay in the
+    vector store), and chunks can be added and removed in place, so an
+    ingest only pays for the files that changed. The IDFs are recomputed
+    once after a series of changes (on save, or before the next search),
+    not after every batch.
+    """
+
+    def __init__(self, ids, postings, doc_lens, k1: float = 1.5, b: float = 0.75):
+        # Chunk id per doc slot; None marks a removed chunk (slots are compacted later)
+        self.ids = ids
+        self.postings = postings
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+        self._refresh()
+
+    def _refresh(self):
+        live = [length for chunk_id, length in zip(self.ids, self.doc_lens) if chunk_id is not None]
+        n = len(live)
+        self.avg_len = (sum(live) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self._stale = False
+
+    @classmethod
+    def build(cls, ids, texts):
+        index = cls([], {}, [])
+        index.add(ids, texts)
+        index._refresh()
+        return index
+
+    def __len__(self):
+        return len(self.ids) - self.ids.count(None)
+
+    def add(self, ids, texts):
+        for chunk_id, text in zip(ids, texts):
+            doc = len(self.ids)
+            counts = Counter(tokenize(text))
+            self.ids.append(chunk_id)
+            self.doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc] = tf
+        self._stale = True
+
+    def remove(self, ids):
+        """Drops the given chunk ids (unknown ids are ignored)."""
+        ids = set(ids)
+        dead = {doc for doc, chunk_id in enumerate(self.ids) if chunk_id in ids}
+        if not dead:
+            return
+        for doc in dead:
+            self.ids[doc] = None
+            self.doc_lens[doc] = 0
+        for term in list(self.postings):
+            docs = self.postings[term]
+            for doc in [doc for doc in docs if doc in dead]:
+                del docs[doc]
+            if not docs:
+                del self.postings[term]
+        # Renumber the slots once more than half of them are empty
+        if 2 * self.ids.count(None) > len(self.ids):
+            self._compact()
+        self._stale = True
+
+    def _compact(self):
+        new_slot = {}
+        for doc, chunk_id in enumerate(self.ids):
+            if chunk_id is not None:
+                new_slot[doc] = len(new_slot)
+        self.ids = [chunk_id for chunk_id in self.ids if chunk_id is not None]
+        self.doc_lens = [length for doc, length in enumerate(self.doc_lens) if doc in new_slot]
+        self.postings = {
+            term: {new_slot[doc]: tf for doc, tf in docs.items()} for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 10):
+        """Returns up to k (doc index, score) pairs, best first."""
+        if self._stale:
+            self._refresh()
+        scores = {}
+        k1, b, avg_len = self.k1, self.b, self.avg_len or 1.0
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc, tf in docs.items():
+                norm = k1 * (1 - b + b * self.doc_lens[doc] / avg_len)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._compact()
+        if self._stale:
+            self._refresh()
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "doc_lens": self.doc_lens,
+            # JSON keys must be strings: store postings as [doc, tf] pairs
+            "postings": {term: [[doc, tf] for doc, tf in docs.items()] for term, docs in self.postings.items()},
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH):
+        # Indexes saved by older versions also hold "texts": ignored
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        postings = {term: {doc: tf for doc, tf in pairs} for term, pairs in data["postings"].items()}
+        return cls(data["ids"], postings, data["doc_lens"], k1=data["k1"], b=data["b"])
+
+def build_index_from_store(vector_db, path: str = INDEX_PATH, page_size: int = STORE_PAGE_SIZE) -> BM25Index:
+    """Rebuilds the BM25 index over exactly the chunks stored in the vector store."""
+    index = BM25Index.build([], [])
+    # Page through the collection so only one page of texts is in memory at a time
+    offset = 0
+    while True:
+        page = vector_db._collection.get(include=["documents"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        index.add(page["ids"], page["documents"])
+        offset += len(page["ids"])
+    index.save(path)
+    return index
+
+def open_index(vector_db, path: str = INDEX_PATH) -> BM25Index:
+    """The saved index if it covers as many chunks as the store holds, else a rebuild from the store."""
+    if os.path.exists(path):
+        index = BM25Index.load(path)
+        if len(index) == vector_db._collection.count():
+            return index
+        print("⚠️ BM25 index is out of sync with the vector store, rebuilding it...")
+    return build_index_from_store(vector_db, path)
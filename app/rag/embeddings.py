@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.utils.rate_limit import estimate_tokens, get_limiter
+
+# Configuration (the only place that decides which embedder is used)
+# "openai": OpenAI API (text-embedding-3-small)
+# "local":  all-MiniLM-L6-v2 on CPU through onnxruntime, no network after the first download
+# "hash":   deterministic feature hashing, for tests and offline benchmarks
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+HASH_EMBEDDING_DIM = 384
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class LocalOnnxEmbeddings(Embeddings):
+    """all-MiniLM-L6-v2 running on the CPU with onnxruntime (384 dimensions)."""
+
+    def __init__(self):
+        # Chroma ships the ONNX model + tokenizer wrapper; the model is downloaded once and cached
+        from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+        self._model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+
+    def embed_documents(self, texts):
+        return [vector.tolist() for vector in self._model(list(texts))]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embedder (signed feature hashing, L2-normalized).
+    Needs no model and no network: texts sharing words get similar vectors.
+    """
+
+    def __init__(self, dim: int = HASH_EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+class RateLimitedEmbeddings(Embeddings):
+    """Sends an API embedder's calls through the shared OpenAI limiter (quota, backoff)."""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        return get_limiter("openai").call(self.inner.embed_documents, texts,
+                                          tokens=sum(estimate_tokens(t) for t in texts))
+
+    def embed_query(self, text):
+        return get_limiter("openai").call(self.inner.embed_query, text, tokens=estimate_tokens(text))
+
+def embedder_id(backend: str = None) -> str:
+    """Identifies the embedder that builds (and must query) a vector store."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "openai":
+        return f"openai:{OPENAI_EMBEDDING_MODEL}"
+    if backend == "local":
+        return "local:all-MiniLM-L6-v2"
+    if backend == "hash":
+        return f"hash:{HASH_EMBEDDING_DIM}"
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: '{backend}'")
+
+# One embedder per backend and process, shared by ingestion and retrieval
+_embedders = {}
+_lock = threading.Lock()
+
+def get_embeddings(backend: str = None) -> Embeddings:
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in _embedders:
+        with _lock:
+            if backend not in _embedders:
+                embedder_id(backend)  # validates the name
+                if backend == "openai":
+                    from langchain_openai import OpenAIEmbeddings
+                    _embedders[backend] = RateLimitedEmbeddings(
+                        OpenAIEmbeddings(model=OPENAI_EMBEDDING_MODEL, max_retries=0))
+                elif backend == "local":
+                    _embedders[backend] = LocalOnnxEmbeddings()
+                else:
+                    _embedders[backend] = HashingEmbeddings()
+    return _embedders[backend]
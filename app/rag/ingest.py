@@ -1,58 +1,238 @@
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from langchain_chroma import Chroma
 from dotenv import load_dotenv
+from app.rag.bm25 import INDEX_PATH, open_index
+from app.rag.embeddings import get_embeddings
+from app.rag.store import DB_PATH, EmbedderMismatchError, open_vector_store
 
 # Load API Keys
 load_dotenv()
 
 # Configuration
 DOCS_FOLDER = "docs"
-DB_PATH = "data/chroma_db"
+# Remembers which version of every PDF is already in the vector store
+MANIFEST_PATH = "data/ingest_manifest.json"
+# Streaming pipeline: PDF parser processes, chunks per embedding call,
+# and how many embedding calls may run at the same time
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+EMBED_BATCH_SIZE = 128
+EMBED_WORKERS = 4
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id_prefix(file_path: str, sha: str) -> str:
+    return hashlib.sha256(f"{os.path.normpath(file_path)}|{sha}".encode("utf-8")).hexdigest()[:16]
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def remove_file_chunks(vector_db, file_path: str, entry: dict = None):
+    """Deletes every chunk of one file from the vector store; returns their ids."""
+    if entry and entry.get("chunk_ids"):
+        ids = entry["chunk_ids"]
+    else:
+        # Indexed before the manifest existed: match on the loader's 'source' metadata
+        ids = vector_db._collection.get(where={"source": file_path}, include=[])["ids"]
+    if ids:
+        vector_db.delete(ids=ids)
+    return ids
+
+def _indexed_chunks(indexed: dict) -> int:
+    return sum(len(entry.get("chunk_ids", [])) for entry in indexed.values())
+
+def load_pdf(file_path: str):
+    """Parses one PDF into page Documents (runs in a worker process)."""
+    return PyPDFLoader(file_path).load()
+
+class Throughput:
+    """Running pages/s and chunks/s counters for the ingestion pipeline."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.pages = 0
+        self.chunks = 0
+
+    def report(self, label: str):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(f"   ⚡ {label}: {self.pages} pages ({self.pages / elapsed:.1f}/s), "
+              f"{self.chunks} chunks ({self.chunks / elapsed:.1f}/s)")
 
 def ingest_documents():
     print(f"📂 Scanning '{DOCS_FOLDER}' for PDFs...")
-    
-    # 1. Load PDFs
-    documents = []
+
     if not os.path.exists(DOCS_FOLDER):
         print(f"❌ Error: Folder '{DOCS_FOLDER}' not found.")
         return
 
-    for file in os.listdir(DOCS_FOLDER):
+    # 1. Compare the PDFs on disk with the manifest
+    manifest = load_manifest()
+    indexed = manifest["files"]
+    current = {}
+    for file in sorted(os.listdir(DOCS_FOLDER)):
         if file.endswith(".pdf"):
             file_path = os.path.join(DOCS_FOLDER, file)
-            print(f"   - Loading: {file}")
-            loader = PyPDFLoader(file_path)
-            documents.extend(loader.load())
+            current[file_path] = file_sha256(file_path)
 
-    if not documents:
+    if not current and not indexed:
         print("⚠️ No PDFs found!")
         return
 
-    print(f"✅ Loaded {len(documents)} pages.")
+    changed = [p for p, sha in current.items() if indexed.get(p, {}).get("sha256") != sha]
+    removed = [p for p in indexed if p not in current]
+    unchanged = len(current) - len(changed)
+    print(f"🔍 {len(changed)} new/changed, {len(removed)} removed, {unchanged} unchanged.")
+
+    # The BM25 index is saved after the manifest: a run that stopped in between left it behind
+    index_current = manifest.get("bm25_chunks") == _indexed_chunks(indexed) and os.path.exists(INDEX_PATH)
+    if not changed and not removed and index_current:
+        print("🎉 Knowledge Base is already up to date.")
+        return
+
+    # This turns text into numbers and saves it locally.
+    # The embedder is configured in app/rag/embeddings.py (EMBEDDING_BACKEND).
+    try:
+        vector_db = open_vector_store(DB_PATH)
+    except EmbedderMismatchError as e:
+        print(f"❌ Error: {e}")
+        return
+    embedding_model = get_embeddings()
+    # Lexical (BM25) index over the same chunks: updated in place, file by file
+    index = open_index(vector_db)
+
+    # 2. Drop the chunks of removed files
+    for file_path in removed:
+        print(f"   - Removing: {file_path}")
+        index.remove(remove_file_chunks(vector_db, file_path, indexed.pop(file_path)))
+        save_manifest(manifest)
+
+    # 3. Streaming pipeline for new and changed files:
+    #    parse (process pool) -> chunk -> embed in batches (thread pool) -> write
+    # Only a bounded number of parsed files and embedding batches are in memory at once.
+    if changed:
+        stats = _run_pipeline(changed, current, indexed, manifest, vector_db, embedding_model, index)
+        stats.report("Done")
 
-    # 2. Split Text (Chunking)
+    # 4. Save the updated lexical index (no embedding calls, no re-read of unchanged chunks)
+    index.save()
+    manifest["bm25_chunks"] = _indexed_chunks(indexed)
+    save_manifest(manifest)
+    print(f"🔤 BM25 index updated: {len(index)} chunks in '{INDEX_PATH}'.")
+
+    print(f"🎉 Success! Knowledge Base updated in '{DB_PATH}'.")
+
+def _run_pipeline(changed, current, indexed, manifest, vector_db, embedding_model, index):
     # We cut text into pieces of 1000 characters so the AI can find specific details easily.
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
-    
-    print(f"🧩 Split into {len(chunks)} text chunks.")
+    stats = Throughput()
 
-    # 3. Create Vector Store (ChromaDB)
-    # This turns text into numbers and saves it locally.
-    print("💾 Saving to Vector Database (this may take a moment)...")
-    embedding_model = OpenAIEmbeddings(model="text-embedding-3-small")
-    
-    Chroma.from_documents(
-        documents=chunks,
-        embedding=embedding_model,
-        persist_directory=DB_PATH
-    )
-    
-    print("🎉 Success! Knowledge Base created in 'data/chroma_db'.")
+    # Chunks waiting for an embedding batch, and bookkeeping per file
+    pending = []
+    chunk_ids = {}        # file -> ids of all its chunks
+    outstanding = {}      # file -> chunks not yet written to the store
+
+    def finish_file(file_path):
+        indexed[file_path] = {"sha256": current[file_path], "chunk_ids": chunk_ids.pop(file_path)}
+        outstanding.pop(file_path)
+        save_manifest(manifest)
+
+    def write_batch(batch, vectors):
+        # Embeddings are already computed, so write straight to the collection
+        vector_db._collection.upsert(
+            ids=[chunk_id for _, chunk_id, _ in batch],
+            embeddings=vectors,
+            documents=[doc.page_content for _, _, doc in batch],
+            metadatas=[doc.metadata for _, _, doc in batch],
+        )
+        index.add([chunk_id for _, chunk_id, _ in batch], [doc.page_content for _, _, doc in batch])
+        stats.chunks += len(batch)
+        for file_path, _, _ in batch:
+            outstanding[file_path] -= 1
+            if outstanding[file_path] == 0:
+                finish_file(file_path)
+        stats.report("Progress")
+
+    with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as parsers, \
+            ThreadPoolExecutor(max_workers=EMBED_WORKERS) as embedders:
+        embedding_jobs = {}
+
+        def drain(limit):
+            # Wait for embedding batches until at most 'limit' are in flight
+            while len(embedding_jobs) > limit:
+                done, _ = wait(embedding_jobs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write_batch(embedding_jobs.pop(future), future.result())
+
+        def submit_batch(batch):
+            texts = [doc.page_content for _, _, doc in batch]
+            embedding_jobs[embedders.submit(embedding_model.embed_documents, texts)] = batch
+            drain(EMBED_WORKERS * 2)
+
+        files = iter(changed)
+        parse_jobs = {}
+
+        def submit_parse():
+            file_path = next(files, None)
+            if file_path is not None:
+                print(f"   - Loading: {file_path}")
+                parse_jobs[parsers.submit(load_pdf, file_path)] = file_path
+
+        for _ in range(PARSE_WORKERS * 2):
+            submit_parse()
+
+        while parse_jobs:
+            done, _ = wait(parse_jobs, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = parse_jobs.pop(future)
+                submit_parse()
+                pages = future.result()
+                chunks = text_splitter.split_documents(pages)
+                stats.pages += len(pages)
+
+                # Old version of the file (or legacy chunks without a manifest entry)
+                index.remove(remove_file_chunks(vector_db, file_path, indexed.get(file_path)))
+
+                # Chunk ids are derived from path + content hash: re-runs never duplicate
+                # vectors, and two copies of the same PDF never share ids
+                prefix = chunk_id_prefix(file_path, current[file_path])
+                ids = [f"{prefix}-{i}" for i in range(len(chunks))]
+                chunk_ids[file_path] = ids
+                outstanding[file_path] = len(chunks)
+                if not chunks:
+                    finish_file(file_path)
+                    continue
+
+                for chunk_id, doc in zip(ids, chunks):
+                    pending.append((file_path, chunk_id, doc))
+                    if len(pending) >= EMBED_BATCH_SIZE:
+                        submit_batch(pending)
+                        pending = []
+
+        if pending:
+            submit_batch(pending)
+        drain(0)
+
+    return stats
 
 if __name__ == "__main__":
-    ingest_documents()
\ No newline at end of file
+    ingest_documents()
@@ -0,0 +1,40 @@
+import numpy as np
+
+def _normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def cosine_relevance(query_vector, candidate_vectors):
+    """Cosine similarity of every candidate to the query, as one matrix-vector product."""
+    return _normalize_rows(candidate_vectors) @ _normalize_rows(query_vector)
+
+def mmr_select(candidate_vectors, relevance, k: int, lambda_mult: float = 0.5):
+    """
+    Maximal marginal relevance over all candidates at once.
+
+    Each round picks the candidate maximizing
+        lambda_mult * relevance - (1 - lambda_mult) * max similarity to the picks so far
+    The "max similarity to the picks" column is updated with one
+    matrix-vector product per pick, so the whole pass is O(k * n * d) in NumPy.
+    Returns candidate indices in selection order.
+    """
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+
+    vectors = _normalize_rows(candidate_vectors)
+    relevance = np.asarray(relevance, dtype=np.float32)
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+
+    for _ in range(min(k, n)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, vectors @ vectors[pick])
+
+    return selected
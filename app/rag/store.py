@@ -0,0 +1,44 @@
+from app.rag.embeddings import embedder_id, get_embeddings
+
+# Define paths
+DB_PATH = "data/chroma_db"
+# Stores created before the embedder was recorded were all built with OpenAI
+LEGACY_EMBEDDER = "openai:text-embedding-3-small"
+
+class EmbedderMismatchError(RuntimeError):
+    """The vector store was built with a different embedder than the configured one."""
+
+def open_vector_store(db_path: str = DB_PATH, backend: str = None):
+    """
+    Opens the Chroma store with the configured embedder.
+
+    The embedder that built the store is recorded in the collection metadata;
+    opening it with any other embedder raises EmbedderMismatchError, because
+    vectors from different models cannot be compared.
+    """
+    # Chroma is heavy to import: only load it when a store is actually opened
+    from langchain_chroma import Chroma
+
+    expected = embedder_id(backend)
+    vector_db = Chroma(
+        persist_directory=db_path,
+        embedding_function=get_embeddings(backend),
+        collection_metadata={"embedder": expected},
+    )
+
+    collection = vector_db._collection
+    recorded = (collection.metadata or {}).get("embedder")
+    if recorded is None:
+        if collection.count() > 0:
+            recorded = LEGACY_EMBEDDER
+        else:
+            collection.modify(metadata={**(collection.metadata or {}), "embedder": expected})
+            recorded = expected
+
+    if recorded != expected:
+        raise EmbedderMismatchError(
+            f"Vector store at '{db_path}' was built with '{recorded}', "
+            f"but the configured embedder is '{expected}'. "
+            f"Re-ingest into a new store or set EMBEDDING_BACKEND to match."
+        )
+    return vector_db
@@ -0,0 +1,230 @@
+"""
+HTTP research service (plain ASGI app, served by uvicorn).
+
+Endpoints:
+  POST /jobs                    {"topic": "..."} -> 202 job status
+                                (429 when the job queue is full)
+  GET  /jobs/{id}               status, stage, report so far, per-node timings
+  GET  /jobs/{id}/events        Server-Sent Events: status, node, token and telemetry
+                                events; resumable with the Last-Event-ID header
+  POST /jobs/{id}/cancel        stops a queued or running job
+  POST /jobs/{id}/resume        restarts a failed or cancelled job from its last
+                                checkpoint -> 202 status of the new job
+  GET  /healthz                 liveness + queue depth
+
+Every job gets its own checkpoint thread; clients cannot pick one, so they
+can neither see another client's job nor mix a finished run's notes into a
+new topic.
+
+Jobs run on the process's JobManager worker pool (app/jobs.py).
+LIMITATION: this service is single-instance. Jobs, their events, the
+checkpoints, caches and vector store all live in the process (and its
+local data/ folder), so a second instance behind a load balancer answers
+404 for every job it did not accept, and a restart loses the job list.
+Scale one instance vertically (RESEARCH_JOB_WORKERS) until job state is
+moved to a shared store.
+With SERVER_API_TOKEN set, every request except /healthz needs
+"Authorization: Bearer <token>".
+
+Usage:
+  python -m app.server          # or: uvicorn app.server:app --host 0.0.0.0 --port 8000
+"""
+from dotenv import load_dotenv
+import asyncio
+import hmac
+import json
+import os
+import re
+from urllib.parse import parse_qs
+
+load_dotenv()
+
+from app.jobs import QueueFullError, get_job_manager
+from app.utils.telemetry import configure_metrics, summarize
+
+# Configuration
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_API_TOKEN = os.getenv("SERVER_API_TOKEN")
+# Largest accepted request body (bytes)
+MAX_BODY_BYTES = 64 * 1024
+MAX_TOPIC_CHARS = 4000
+# How often an SSE stream checks its job for new events, and sends a
+# keep-alive comment when nothing happened (seconds)
+SSE_POLL_SECONDS = 0.2
+SSE_KEEPALIVE_SECONDS = 15
+
+FINAL_STATUSES = ("done", "failed", "cancelled")
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/events|/cancel|/resume)?$")
+
+# --- Responses ---
+
+async def _send_json(send, status: int, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start", "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_error(send, status: int, message: str, headers=()):
+    await _send_json(send, status, {"error": message}, headers)
+
+async def _read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("request body too large")
+        if not message.get("more_body"):
+            return body
+
+def _header(scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+def _authorized(scope) -> bool:
+    if not SERVER_API_TOKEN:
+        return True
+    return hmac.compare_digest(_header(scope, b"authorization"), f"Bearer {SERVER_API_TOKEN}")
+
+def _job_status(job) -> dict:
+    snapshot = job.snapshot()
+    snapshot["timings"] = summarize(snapshot.pop("telemetry"))
+    return snapshot
+
+# --- Handlers ---
+
+async def create_job(scope, receive, send):
+    try:
+        payload = json.loads(await _read_body(receive) or b"{}")
+    except ValueError as e:
+        return await _send_error(send, 400, f"invalid JSON body: {e}")
+    topic = payload.get("topic") if isinstance(payload, dict) else None
+    if not isinstance(topic, str) or not topic.strip():
+        return await _send_error(send, 400, "'topic' (non-empty string) is required")
+    if len(topic) > MAX_TOPIC_CHARS:
+        return await _send_error(send, 400, f"'topic' is longer than {MAX_TOPIC_CHARS} characters")
+    if "thread_id" in payload:
+        return await _send_error(send, 400, "'thread_id' is not accepted; resume a job with POST /jobs/{id}/resume")
+    await _submit(send, topic.strip())
+
+async def _submit(send, topic: str, thread_id: str = None):
+    try:
+        job = get_job_manager().submit(topic, thread_id)
+    except QueueFullError as e:
+        return await _send_error(send, 429, str(e), headers=[(b"retry-after", b"30")])
+    await _send_json(send, 202, _job_status(job), headers=[(b"location", f"/jobs/{job.id}".encode())])
+
+async def resume_job(send, job):
+    # Same thread, same topic: the run continues from its last checkpoint.
+    # Finished runs are not reused, so old notes never leak into another report.
+    if job.status not in ("failed", "cancelled"):
+        return await _send_error(send, 409, f"only failed or cancelled jobs can be resumed (job is {job.status})")
+    latest = get_job_manager().job_for_thread(job.thread_id) or job
+    if latest.status == "done":
+        return await _send_error(send, 409, f"job was already resumed and finished as {latest.id}")
+    await _submit(send, job.topic, job.thread_id)
+
+async def stream_events(scope, receive, send, job):
+    """Streams the job's events as SSE until it has finished (or the client goes away)."""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    last_id = _header(scope, b"last-event-id") or (query.get("after") or ["0"])[0]
+    cursor = int(last_id) if last_id.isdigit() else 0
+
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    await send({
+        "type": "http.response.start", "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")],
+    })
+    try:
+        idle = 0.0
+        while not disconnected.is_set():
+            # Read the status before the events, so no event published in between is lost
+            finished = job.status in FINAL_STATUSES
+            events = job.events_since(cursor)
+            for kind, data in events:
+                cursor += 1
+                message = f"id: {cursor}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                await send({"type": "http.response.body", "body": message.encode("utf-8"), "more_body": True})
+            if finished:
+                break
+            if events:
+                idle = 0.0
+            elif idle >= SSE_KEEPALIVE_SECONDS:
+                await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+                idle = 0.0
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        watcher.cancel()
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"].rstrip("/") or "/"
+    if path == "/healthz" and method == "GET":
+        return await _send_json(send, 200, {"status": "ok", **get_job_manager().counts()})
+    if not _authorized(scope):
+        return await _send_error(send, 401, "missing or invalid bearer token")
+
+    if path == "/jobs":
+        if method != "POST":
+            return await _send_error(send, 405, "use POST")
+        return await create_job(scope, receive, send)
+
+    match = _JOB_PATH.match(path)
+    job = get_job_manager().get(match.group(1)) if match else None
+    if job is None:
+        return await _send_error(send, 404, "not found")
+
+    action = match.group(2)
+    if action is None and method == "GET":
+        return await _send_json(send, 200, _job_status(job))
+    if action == "/events" and method == "GET":
+        return await stream_events(scope, receive, send, job)
+    if action == "/cancel" and method == "POST":
+        if not get_job_manager().cancel(job.id):
+            return await _send_error(send, 409, f"job already {job.status}")
+        return await _send_json(send, 202, _job_status(job))
+    if action == "/resume" and method == "POST":
+        return await resume_job(send, job)
+    await _send_error(send, 405, "method not allowed")
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            configure_metrics()
+            # Start the worker pool (and build the graph) before the first request
+            get_job_manager()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Stop running jobs at their next event; their checkpoints allow a resume
+            get_job_manager().cancel_all()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+if __name__ == "__main__":
+    import uvicorn
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print(" ERROR: OPENAI_API_KEY is missing! Check your .env file.")
+        exit(1)
+    uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
@@ -1,26 +1,313 @@
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+from langchain_core.documents import Document
+from app.rag.bm25 import INDEX_PATH, BM25Index
+from app.rag.embeddings import get_embeddings
+from app.rag.rerank import cosine_relevance, mmr_select
+from app.rag.store import DB_PATH, open_vector_store
+from app.utils.telemetry import instrument_tool, record_cache
 
-# Define paths
-DB_PATH = "data/chroma_db"
+# How many query embeddings to keep in memory
+EMBEDDING_CACHE_SIZE = 1024
+# "hybrid": BM25 + vector scores fused (with a lexical fast path), "vector": vector search only
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Candidates fetched from each side before fusion
+FETCH_K = 20
+# Weight of the vector score in the fused score (the rest goes to BM25)
+HYBRID_ALPHA = 0.5
+# Lexical fast path: answer from BM25 alone (no embedding call) when the best
+# hit scores at least LEXICAL_MIN_SCORE and beats the runner-up by LEXICAL_CONFIDENCE_RATIO
+LEXICAL_MIN_SCORE = 8.0
+LEXICAL_CONFIDENCE_RATIO = 1.5
+# Post-retrieval stage: "mmr" picks a diverse top-k from the candidates, "none" keeps the ranking
+RERANK = os.getenv("RETRIEVAL_RERANK", "mmr")
+# Chunks returned per lookup
+RETRIEVAL_K = 3
+# 1.0 = pure relevance, 0.0 = pure diversity
+MMR_LAMBDA = 0.5
+# Minimum cosine similarity to the query (None = keep every candidate)
+SCORE_THRESHOLD = None
 
-def retrieve_tool(query: str):
+class Candidate(NamedTuple):
+    id: str
+    text: str
+    metadata: dict
+    score: float
+    embedding: list
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: case-insensitive, whitespace-collapsed."""
+    return " ".join(query.split()).casefold()
+
+def _min_max(scores: dict) -> dict:
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (value - low) / (high - low) for key, value in scores.items()}
+
+def fuse_scores(lexical: dict, vector: dict, alpha: float = HYBRID_ALPHA):
     """
-    Searches the local knowledge base (PDFs) for relevant information.
+    Fuses BM25 scores and vector similarities (both keyed by chunk id) into
+    one ranking. Each side is min-max normalized; a chunk missing from one
+    side gets 0 there. Returns (chunk id, fused score) pairs, best first.
     """
-    print(f"    📚 Querying Local Documents for: '{query}'")
-    
-    # 1. Connect to the Database
-    embedding_function = OpenAIEmbeddings(model="text-embedding-3-small")
-    vector_db = Chroma(persist_directory=DB_PATH, embedding_function=embedding_function)
-    
-    # 2. Search (Get top 3 most relevant chunks)
-    results = vector_db.similarity_search(query, k=3)
-    
-    # 3. Format results as a string
+    lexical, vector = _min_max(lexical), _min_max(vector)
+    fused = {
+        key: alpha * vector.get(key, 0.0) + (1 - alpha) * lexical.get(key, 0.0)
+        for key in set(lexical) | set(vector)
+    }
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+def is_confident(lexical_hits) -> bool:
+    """True when the best BM25 hit is strong and clearly ahead of the rest."""
+    if not lexical_hits:
+        return False
+    best = lexical_hits[0][1]
+    if best < LEXICAL_MIN_SCORE:
+        return False
+    return len(lexical_hits) == 1 or best >= LEXICAL_CONFIDENCE_RATIO * lexical_hits[1][1]
+
+class LocalRetriever:
+    """
+    Long-lived handle on the local knowledge base.
+
+    Opens the embedding client and the Chroma collection once and keeps them
+    warm, and remembers the embedding of recent queries (bounded LRU), so
+    repeated lookups skip both the reopen and the embedding call.
+    In hybrid mode it also keeps the BM25 index in memory (reloaded when the
+    file changes) and skips the embedding call when BM25 alone is confident.
+    Candidates are over-fetched with their embeddings and reduced to a
+    diverse top-k by MMR, so near-identical overlapping chunks are not all
+    sent to the reporter. Safe to share between threads.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, cache_size: int = EMBEDDING_CACHE_SIZE,
+                 index_path: str = INDEX_PATH, mode: str = RETRIEVAL_MODE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.index_path = index_path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._embeddings = None
+        self._vector_db = None
+        self._bm25 = None
+        self._bm25_mtime = None
+
+    def _open(self):
+        # Connect to the Database (only once)
+        if self._vector_db is None:
+            with self._lock:
+                if self._vector_db is None:
+                    # Raises EmbedderMismatchError if the store was built with another embedder
+                    vector_db = open_vector_store(self.db_path)
+                    # _vector_db is what other threads check without the lock: publish it last
+                    self._embeddings = get_embeddings()
+                    self._vector_db = vector_db
+        return self._vector_db
+
+    def _lexical_index(self):
+        # (Re)load the BM25 index when ingestion has rewritten it
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return None
+        if mtime != self._bm25_mtime:
+            with self._lock:
+                if mtime != self._bm25_mtime:
+                    self._bm25 = BM25Index.load(self.index_path)
+                    self._bm25_mtime = mtime
+        return self._bm25
+
+    def _cached_embedding(self, key: str):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+            return vector
+
+    def _remember(self, key: str, vector):
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def embed_query(self, query: str):
+        key = normalize_query(query)
+        vector = self._cached_embedding(key)
+        record_cache("query_embedding", vector is not None)
+        if vector is None:
+            self._open()
+            vector = self._embeddings.embed_query(" ".join(query.split()))
+            self._remember(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str):
+        key = normalize_query(query)
+        vector = self._cached_embedding(key)
+        record_cache("query_embedding", vector is not None)
+        if vector is None:
+            await asyncio.to_thread(self._open)
+            vector = await self._embeddings.aembed_query(" ".join(query.split()))
+            self._remember(key, vector)
+        return vector
+
+    def lexical_search(self, query: str, k: int = FETCH_K):
+        """BM25 hits as (chunk id, score), best first. Empty without an index."""
+        index = self._lexical_index()
+        if index is None:
+            return []
+        return [(index.ids[doc], score) for doc, score in index.search(query, k)]
+
+    def _vector_hits(self, vector, n: int):
+        # Query the collection directly to get chunk ids and embeddings next to the distances
+        result = self._open()._collection.query(
+            query_embeddings=[vector], n_results=n,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        return [
+            Candidate(chunk_id, text, metadata or {}, -distance, embedding)
+            for chunk_id, text, metadata, distance, embedding in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0],
+                result["distances"][0], result["embeddings"][0],
+            )
+        ]
+
+    def _stored_chunks(self, ids):
+        # Text, metadata and embedding of lexical-only candidates, read back from the
+        # store (the BM25 index only keeps ids; no embedding call)
+        ids = list(ids)
+        if not ids:
+            return {}
+        stored = self._open()._collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        return {
+            chunk_id: (text, metadata or {}, embedding)
+            for chunk_id, text, metadata, embedding in zip(
+                stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"],
+            )
+        }
+
+    def _lexical_candidates(self, lexical_hits):
+        stored = self._stored_chunks(chunk_id for chunk_id, _ in lexical_hits)
+        return [
+            Candidate(chunk_id, stored[chunk_id][0], stored[chunk_id][1], score, stored[chunk_id][2])
+            for chunk_id, score in lexical_hits if chunk_id in stored
+        ]
+
+    def _hybrid_candidates(self, lexical_hits, vector_hits):
+        if not lexical_hits:
+            return vector_hits
+
+        by_id = {candidate.id: candidate for candidate in vector_hits}
+        stored = self._stored_chunks(chunk_id for chunk_id, _ in lexical_hits if chunk_id not in by_id)
+
+        candidates = []
+        for chunk_id, score in fuse_scores(
+            dict(lexical_hits),
+            {candidate.id: candidate.score for candidate in vector_hits},
+        ):
+            if chunk_id in by_id:
+                candidates.append(by_id[chunk_id]._replace(score=score))
+            elif chunk_id in stored:
+                text, metadata, embedding = stored[chunk_id]
+                candidates.append(Candidate(chunk_id, text, metadata, score, embedding))
+        return candidates
+
+    def _select(self, query_vector, candidates, k, lambda_mult, score_threshold):
+        """Drops candidates below the score threshold, then picks a diverse top-k (MMR)."""
+        if query_vector is not None and score_threshold is not None and candidates:
+            similarity = cosine_relevance(query_vector, [c.embedding for c in candidates])
+            candidates = [c for c, sim in zip(candidates, similarity) if sim >= score_threshold]
+        if not candidates:
+            return []
+
+        if RERANK == "mmr":
+            # Relevance is the ranking score (fused, BM25 or vector), scaled to [0, 1]
+            relevance = list(_min_max({i: c.score for i, c in enumerate(candidates)}).values())
+            picks = mmr_select([c.embedding for c in candidates], relevance, k, lambda_mult)
+        else:
+            picks = range(min(k, len(candidates)))
+
+        return [
+            Document(page_content=candidates[i].text, metadata=candidates[i].metadata, id=candidates[i].id)
+            for i in picks
+        ]
+
+    def search(self, query: str, k: int = RETRIEVAL_K, mode: str = None,
+               lambda_mult: float = MMR_LAMBDA, score_threshold: float = SCORE_THRESHOLD):
+        mode = mode or self.mode
+        lexical_hits = self.lexical_search(query) if mode == "hybrid" else []
+        if is_confident(lexical_hits):
+            return self._select(None, self._lexical_candidates(lexical_hits), k, lambda_mult, None)
+
+        vector = self.embed_query(query)
+        vector_hits = self._vector_hits(vector, max(k, FETCH_K))
+        candidates = self._hybrid_candidates(lexical_hits, vector_hits)
+        return self._select(vector, candidates, k, lambda_mult, score_threshold)
+
+    async def asearch(self, query: str, k: int = RETRIEVAL_K, mode: str = None,
+                      lambda_mult: float = MMR_LAMBDA, score_threshold: float = SCORE_THRESHOLD):
+        mode = mode or self.mode
+        lexical_hits = self.lexical_search(query) if mode == "hybrid" else []
+        if is_confident(lexical_hits):
+            candidates = await asyncio.to_thread(self._lexical_candidates, lexical_hits)
+            return self._select(None, candidates, k, lambda_mult, None)
+
+        vector = await self.aembed_query(query)
+        vector_hits = await asyncio.to_thread(self._vector_hits, vector, max(k, FETCH_K))
+        candidates = await asyncio.to_thread(self._hybrid_candidates, lexical_hits, vector_hits)
+        return self._select(vector, candidates, k, lambda_mult, score_threshold)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+# One retriever per process, shared by every run and session
+_retriever = None
+_retriever_lock = threading.Lock()
+
+def get_retriever() -> LocalRetriever:
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = LocalRetriever()
+    return _retriever
+
+def _format_results(results):
+    # Format results as a string
     context_text = "\n\n".join([doc.page_content for doc in results])
-    
+
     if not context_text:
         return "No relevant information found in local documents."
-        
-    return f"SOURCES FROM LOCAL DOCUMENTS:\n{context_text}"
\ No newline at end of file
+
+    return f"SOURCES FROM LOCAL DOCUMENTS:\n{context_text}"
+
+@instrument_tool("retrieve")
+def retrieve_tool(query: str):
+    """
+    Searches the local knowledge base (PDFs) for relevant information.
+    """
+    print(f"    📚 Querying Local Documents for: '{query}'")
+
+    # Search (Get the RETRIEVAL_K most relevant, non-redundant chunks) on the shared, warm retriever
+    results = get_retriever().search(query)
+
+    return _format_results(results)
+
+@instrument_tool("retrieve")
+async def aretrieve_tool(query: str):
+    """
+    Async version of retrieve_tool (does not block the event loop).
+    """
+    print(f"    📚 Querying Local Documents for: '{query}'")
+
+    results = await get_retriever().asearch(query)
+
+    return _format_results(results)
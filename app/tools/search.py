@@ -1,8 +1,72 @@
-from langchain_community.tools import DuckDuckGoSearchRun
+import asyncio
+import threading
+from app.tools.retrieve import normalize_query
+from app.utils.cache import SqliteTTLCache, SingleFlight
+from app.utils.rate_limit import get_limiter
+from app.utils.telemetry import instrument_tool, record_cache
 
-def search_tool(query: str):
+# Configuration
+CACHE_PATH = "data/search_cache.db"
+CACHE_MAX_ENTRIES = 5000
+# How long a cached result stays valid (seconds)
+CACHE_TTL = 24 * 3600
+# Realtime queries (today / latest / breaking ...) go stale much faster
+REALTIME_CACHE_TTL = 15 * 60
+
+# Shared across every run and session in the process
+_search = None
+_cache = None
+_init_lock = threading.Lock()
+_in_flight = SingleFlight()
+
+def _get_search():
+    global _search
+    if _search is None:
+        with _init_lock:
+            if _search is None:
+                # Imported on first search: keeps the app import fast
+                from langchain_community.tools import DuckDuckGoSearchRun
+                _search = DuckDuckGoSearchRun()
+    return _search
+
+def get_search_cache() -> SqliteTTLCache:
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = SqliteTTLCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES, table="search_results")
+    return _cache
+
+def _search_and_cache(key: str, query: str, ttl: float):
+    # Shared DuckDuckGo quota: paced, and retried with backoff when throttled
+    result = get_limiter("duckduckgo").call(_get_search().run, query)
+    get_search_cache().set(key, result, ttl=ttl)
+    return result
+
+@instrument_tool("web_search")
+def search_tool(query: str, realtime: bool = False):
     """
     Executes a web search and returns the top results.
+
+    Results are cached on disk by normalized query (shorter TTL when the
+    query is realtime), and identical queries running at the same time are
+    merged into a single DuckDuckGo request.
+    """
+    key = normalize_query(query)
+    ttl = REALTIME_CACHE_TTL if realtime else CACHE_TTL
+
+    # An entry written by a non-realtime query may be too old for a realtime one
+    cached = get_search_cache().get(key, max_age=ttl)
+    record_cache("search", cached is not None)
+    if cached is not None:
+        print(f"    🌐 Web search (cached): '{query}'")
+        return cached
+
+    print(f"    🌐 Web search: '{query}'")
+    return _in_flight.do(key, _search_and_cache, key, query, ttl)
+
+async def asearch_tool(query: str, realtime: bool = False):
+    """
+    Async version of search_tool (does not block the event loop).
     """
-    search = DuckDuckGoSearchRun()
-    return search.run(query)
\ No newline at end of file
+    return await asyncio.to_thread(search_tool, query, realtime)
@@ -0,0 +1,35 @@
+import threading
+from app.utils.telemetry import usage_callback
+
+# Heavy SDKs (langchain_openai, openai) are imported on first use, and every
+# client is created once per process and shared: importing the app stays fast
+# and needs no API key, and Streamlit reruns reuse the same connections.
+_chat_models = {}
+_openai_client = None
+_lock = threading.Lock()
+
+def get_chat_model(model: str = "gpt-4o-mini", temperature: float = 0):
+    """
+    Shared ChatOpenAI client (token usage reported to telemetry, streamed answers included).
+    It does not retry by itself: calls go through RateLimited (app/utils/rate_limit.py),
+    which retries with backoff shared by the whole process.
+    """
+    key = (model, temperature)
+    if key not in _chat_models:
+        with _lock:
+            if key not in _chat_models:
+                from langchain_openai import ChatOpenAI
+                _chat_models[key] = ChatOpenAI(model=model, temperature=temperature,
+                                               stream_usage=True, callbacks=[usage_callback],
+                                               max_retries=0)
+    return _chat_models[key]
+
+def get_openai_client():
+    """Shared OpenAI SDK client (speech, transcription, the Streamlit consultant); no retries of its own either."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(max_retries=0)
+    return _openai_client
@@ -1,5 +1,36 @@
 from fpdf import FPDF
+from collections import OrderedDict
+import hashlib
 import os
+import re
+import threading
+import unicodedata
+
+# How many rendered reports to keep in memory
+PDF_CACHE_SIZE = 32
+
+# Characters the core PDF fonts (latin-1) cannot show, mapped to readable equivalents
+_REPLACEMENTS = {
+    "\u2018": "'", "\u2019": "'", "\u201a": ",", "\u201c": '"', "\u201d": '"', "\u201e": '"',
+    "\u2013": "-", "\u2014": "-", "\u2212": "-", "\u2026": "...", "\u2022": "-", "\u25cf": "-",
+    "\u2009": " ", "\u202f": " ", "\u200b": "", "\u2192": "->", "\u2190": "<-", "\u2264": "<=",
+    "\u2265": ">=", "\u2248": "~", "\u2260": "!=", "\u2122": "(TM)", "\u20ac": "EUR",
+}
+
+def to_latin1(text: str) -> str:
+    """Makes text printable with the core fonts instead of mangling it into '?'."""
+    out = []
+    for char in text:
+        char = _REPLACEMENTS.get(char, char)
+        if len(char) != 1 or ord(char) < 256:
+            out.append(char)
+            continue
+        # Emojis and other symbols are dropped, accented letters lose the accent
+        if unicodedata.category(char) in ("So", "Sk", "Cs", "Co", "Mn"):
+            continue
+        base = unicodedata.normalize("NFKD", char).encode("latin-1", "ignore").decode("latin-1")
+        out.append(base or "?")
+    return "".join(out)
 
 class PDFReport(FPDF):
     def header(self):
@@ -12,19 +43,100 @@ class PDFReport(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
-def create_pdf(text, filename="research_report.pdf"):
+    def write_inline(self, text: str, size: int = 11, height: float = 6):
+        """Writes one line of Markdown text, honouring **bold** spans."""
+        text = re.sub(r"`([^`]*)`", r"\1", text)
+        text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+        for i, part in enumerate(re.split(r"\*\*(.+?)\*\*", text)):
+            if not part:
+                continue
+            self.set_font('Arial', 'B' if i % 2 else '', size)
+            # Single *italic* / _italic_ markers are simply removed
+            self.write(height, re.sub(r"(?<!\w)[*_]|[*_](?!\w)", "", part))
+        self.ln(height)
+
+    def write_list_item(self, marker: str, text: str, indent: float):
+        left = self.l_margin
+        self.set_left_margin(left + indent)
+        self.set_x(left + indent)
+        self.set_font('Arial', '', 11)
+        self.write(6, f"{marker} ")
+        self.write_inline(text)
+        self.set_left_margin(left)
+
+    def render_markdown(self, text: str):
+        """Renders the Markdown subset the reporter produces: headings, lists, bold, rules, code."""
+        in_code = False
+        for line in to_latin1(text).splitlines():
+            stripped = line.strip()
+
+            if stripped.startswith("```"):
+                in_code = not in_code
+                continue
+            if in_code:
+                self.set_font('Courier', '', 9)
+                self.multi_cell(0, 5, line)
+                continue
+
+            if not stripped:
+                self.ln(3)
+                continue
+
+            heading = re.match(r"(#{1,6})\s+(.*)", stripped)
+            bullet = re.match(r"[-*+]\s+(.*)", stripped)
+            numbered = re.match(r"(\d+)[.)]\s+(.*)", stripped)
+            depth = (len(line) - len(line.lstrip())) // 2
+
+            if heading:
+                level = len(heading.group(1))
+                size = {1: 18, 2: 15, 3: 13}.get(level, 12)
+                self.ln(2)
+                self.set_font('Arial', 'B', size)
+                self.multi_cell(0, size * 0.5, heading.group(2).replace("**", ""))
+                self.ln(1)
+            elif re.fullmatch(r"[-*_]{3,}", stripped):
+                y = self.get_y() + 2
+                self.line(self.l_margin, y, self.w - self.r_margin, y)
+                self.ln(5)
+            elif bullet:
+                self.write_list_item("-", bullet.group(1), 5 + 5 * depth)
+            elif numbered:
+                self.write_list_item(f"{numbered.group(1)}.", numbered.group(2), 5 + 5 * depth)
+            else:
+                self.write_inline(stripped)
+
+# Rendered PDFs by report content hash (bounded, least recently used evicted first)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def render_pdf(text: str) -> bytes:
+    """
+    Renders a Markdown report to PDF bytes, entirely in memory.
+    The same report is only rendered once; later calls are served from cache.
+    """
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
     pdf = PDFReport()
     pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    # Handle unicode/latin-1 issues by replacing common problem characters
-    # (FPDF is simple and sometimes struggles with emojis/special chars)
-    safe_text = text.encode('latin-1', 'replace').decode('latin-1')
-    
-    pdf.multi_cell(0, 10, safe_text)
-    
+    pdf.render_markdown(text)
+    data = pdf.output(dest="S").encode("latin-1")
+
+    with _cache_lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > PDF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return data
+
+def create_pdf(text, filename="research_report.pdf"):
+    """Saves the report as a PDF file (for scripts; the UI uses render_pdf)."""
     # Ensure directory exists
     os.makedirs("downloads", exist_ok=True)
     output_path = f"downloads/{filename}"
-    pdf.output(output_path)
-    return output_path
\ No newline at end of file
+    with open(output_path, "wb") as f:
+        f.write(render_pdf(text))
+    return output_path
@@ -0,0 +1,358 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.config import ensure_config, merge_configs
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt
+
+# Configuration: per-provider quotas, shared by every run, session and thread
+# of the process. Requests/tokens per minute refill continuously; a bucket
+# holds BURST_FRACTION of a minute's quota, so bursts stay within the quota.
+PROVIDER_LIMITS = {
+    "openai": {
+        "requests_per_minute": int(os.getenv("OPENAI_RPM", "500")),
+        "tokens_per_minute": int(os.getenv("OPENAI_TPM", "200000")),
+        "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+        "latency_target": None,
+    },
+    # Speech and transcription have their own (much lower) limits
+    "openai_audio": {
+        "requests_per_minute": int(os.getenv("OPENAI_AUDIO_RPM", "50")),
+        "tokens_per_minute": None,
+        "max_concurrency": int(os.getenv("OPENAI_AUDIO_MAX_CONCURRENCY", "4")),
+        "latency_target": None,
+    },
+    # DuckDuckGo has no published quota; it throttles bursts, and slows down first
+    "duckduckgo": {
+        "requests_per_minute": int(os.getenv("DDG_RPM", "30")),
+        "tokens_per_minute": None,
+        "max_concurrency": int(os.getenv("DDG_MAX_CONCURRENCY", "2")),
+        "latency_target": float(os.getenv("DDG_LATENCY_TARGET", "8")),
+    },
+}
+BURST_FRACTION = 0.1
+# Attempts per call (first try included) and the longest wait between two
+MAX_ATTEMPTS = int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "6"))
+MAX_BACKOFF_SECONDS = 60
+# Completion tokens assumed for a chat call when reserving token quota
+DEFAULT_COMPLETION_TOKENS = 500
+
+# --- Error classification (by name / status, so no SDK has to be imported) ---
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or "ratelimit" in type(exc).__name__.lower()
+
+def is_retryable(exc: BaseException) -> bool:
+    """Throttling, timeouts, connection drops and server errors are worth another try."""
+    if is_rate_limited(exc):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409) or status >= 500
+    name = type(exc).__name__.lower()
+    return any(word in name for word in ("timeout", "connection", "serviceunavailable"))
+
+def retry_after(exc: BaseException):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(value) -> int:
+    # ~4 characters per token; only used to reserve quota before a call
+    return len(str(value)) // 4
+
+# --- Building blocks ---
+
+class TokenBucket:
+    """Continuously refilling bucket of 'rate' units per second, holding at most 'capacity'."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, amount: float) -> float:
+        # Takes 'amount' if available; otherwise returns how long to wait for it
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._level >= amount:
+                self._level -= amount
+                return 0.0
+            return (amount - self._level) / self.rate
+
+    def acquire(self, amount: float = 1):
+        while (wait := self._take(amount)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, amount: float = 1):
+        while (wait := self._take(amount)) > 0:
+            await asyncio.sleep(wait)
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit that adapts like TCP congestion control (AIMD): every
+    success raises it a little (+1 per 'limit' successes), a throttle or a
+    slow call cuts it (x0.5 / x0.9), between 1 and max_limit.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self.in_flight < max(1, int(self.limit)):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= max(1, int(self.limit)):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        # The condition belongs to threads: the event loop polls instead of blocking
+        while not self._try_enter():
+            await asyncio.sleep(0.05)
+
+    def release(self, outcome: str):
+        """outcome: 'ok', 'slow', 'throttled' or 'error' (no change)."""
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome == "slow":
+                self.limit = max(1.0, self.limit * 0.9)
+            elif outcome == "throttled":
+                self.limit = max(1.0, self.limit * 0.5)
+            self._cond.notify_all()
+
+class ProviderLimiter:
+    """
+    Everything one provider's calls go through: request and token buckets,
+    adaptive concurrency, a shared pause when the provider says "slow down",
+    and retries with jittered exponential backoff.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int = None,
+                 max_concurrency: int = 8, latency_target: float = None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute * BURST_FRACTION))
+        self.tokens = (TokenBucket(tokens_per_minute / 60, max(1.0, tokens_per_minute * BURST_FRACTION))
+                       if tokens_per_minute else None)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.latency_target = latency_target
+        self._paused_until = 0.0
+
+    # Waiting
+
+    def _pause(self, exc: BaseException):
+        # One 429 pauses every caller of this provider, not just the one that got it
+        seconds = retry_after(exc)
+        if seconds:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _outcome(self, exc: BaseException, started: float) -> str:
+        if exc is not None:
+            if is_rate_limited(exc):
+                self._pause(exc)
+                return "throttled"
+            return "error"
+        if self.latency_target and time.monotonic() - started > self.latency_target:
+            return "slow"
+        return "ok"
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        """Holds one request slot (quota + concurrency) for the duration of a call."""
+        if (pause := self._paused_until - time.monotonic()) > 0:
+            time.sleep(pause)
+        self.requests.acquire()
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+        self.concurrency.acquire()
+        started, error = time.monotonic(), None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.concurrency.release(self._outcome(error, started))
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0):
+        if (pause := self._paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+        await self.requests.aacquire()
+        if self.tokens and tokens:
+            await self.tokens.aacquire(tokens)
+        await self.concurrency.aacquire()
+        started, error = time.monotonic(), None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.concurrency.release(self._outcome(error, started))
+
+    # Retrying
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        wait = random.uniform(0, min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** attempt))
+        return max(wait, retry_after(exc) or 0.0)
+
+    def _wait(self, retry_state) -> float:
+        return self.backoff(retry_state.attempt_number, retry_state.outcome.exception())
+
+    def _before_sleep(self, retry_state):
+        exc = retry_state.outcome.exception()
+        print(f"    ⏳ {self.name}: {type(exc).__name__}, retry {retry_state.attempt_number}/{MAX_ATTEMPTS - 1} "
+              f"in {retry_state.next_action.sleep:.1f}s")
+
+    def _retrying(self, cls, retryable=is_retryable):
+        return cls(stop=stop_after_attempt(MAX_ATTEMPTS), wait=self._wait,
+                   retry=retry_if_exception(retryable), before_sleep=self._before_sleep, reraise=True)
+
+    def call(self, fn, *args, tokens: int = 0, retryable=is_retryable, **kwargs):
+        """
+        fn(*args, **kwargs) within the provider's limits, retried on throttling and
+        transient errors (the errors 'retryable' accepts).
+        """
+        for attempt in self._retrying(Retrying, retryable):
+            with attempt:
+                with self.slot(tokens):
+                    return fn(*args, **kwargs)
+
+    async def acall(self, fn, *args, tokens: int = 0, retryable=is_retryable, **kwargs):
+        """Async version of call (fn returns an awaitable)."""
+        async for attempt in self._retrying(AsyncRetrying, retryable):
+            with attempt:
+                async with self.aslot(tokens):
+                    return await fn(*args, **kwargs)
+
+    def stream(self, make_stream, tokens: int = 0):
+        """
+        Yields from make_stream() within the limits. Only failures before the
+        first chunk are retried: chunks already passed on cannot be taken back.
+        """
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            emitted = False
+            try:
+                with self.slot(tokens):
+                    for chunk in make_stream():
+                        emitted = True
+                        yield chunk
+                return
+            except Exception as e:
+                if emitted or attempt == MAX_ATTEMPTS or not is_retryable(e):
+                    raise
+                wait = self.backoff(attempt, e)
+                print(f"    ⏳ {self.name}: {type(e).__name__}, retry {attempt}/{MAX_ATTEMPTS - 1} in {wait:.1f}s")
+                time.sleep(wait)
+
+    async def astream(self, make_stream, tokens: int = 0):
+        """Async version of stream (make_stream returns an async iterator)."""
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            emitted = False
+            try:
+                async with self.aslot(tokens):
+                    async for chunk in make_stream():
+                        emitted = True
+                        yield chunk
+                return
+            except Exception as e:
+                if emitted or attempt == MAX_ATTEMPTS or not is_retryable(e):
+                    raise
+                wait = self.backoff(attempt, e)
+                print(f"    ⏳ {self.name}: {type(e).__name__}, retry {attempt}/{MAX_ATTEMPTS - 1} in {wait:.1f}s")
+                await asyncio.sleep(wait)
+
+# One limiter per provider and process
+_limiters = {}
+_lock = threading.Lock()
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    if provider not in _limiters:
+        with _lock:
+            if provider not in _limiters:
+                _limiters[provider] = ProviderLimiter(provider, **PROVIDER_LIMITS[provider])
+    return _limiters[provider]
+
+class _OutputWatcher(BaseCallbackHandler):
+    """Notices the first token a model streams out to the run's callbacks."""
+
+    def __init__(self):
+        self.started = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.started = True
+
+    def retryable(self, exc: BaseException) -> bool:
+        # Tokens already streamed (e.g. to the graph's "messages" stream)
+        # cannot be taken back: a retry would send the text twice
+        return not self.started and is_retryable(exc)
+
+class RateLimited(Runnable):
+    """
+    Runs a chain (prompt | model ...) through a provider limiter: invoke,
+    ainvoke, stream and astream (and batch, via invoke) all wait for quota and
+    retry throttled calls, but only until the model has streamed its first
+    token. Token quota is reserved from the size of the input.
+    """
+
+    def __init__(self, bound: Runnable, provider: str = "openai",
+                 completion_tokens: int = DEFAULT_COMPLETION_TOKENS):
+        self.bound = bound
+        self.provider = provider
+        self.completion_tokens = completion_tokens
+
+    @property
+    def limiter(self) -> ProviderLimiter:
+        return get_limiter(self.provider)
+
+    def _tokens(self, input) -> int:
+        return estimate_tokens(input) + self.completion_tokens
+
+    def _config(self, config, watcher: _OutputWatcher) -> dict:
+        # ensure_config picks up the calling node's config (and its callbacks)
+        # when none is passed, so the call stays in the graph's callback tree
+        return merge_configs(ensure_config(config), {"callbacks": [watcher]})
+
+    def invoke(self, input, config=None, **kwargs):
+        watcher = _OutputWatcher()
+        return self.limiter.call(self.bound.invoke, input, self._config(config, watcher),
+                                 tokens=self._tokens(input), retryable=watcher.retryable, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        watcher = _OutputWatcher()
+        return await self.limiter.acall(self.bound.ainvoke, input, self._config(config, watcher),
+                                        tokens=self._tokens(input), retryable=watcher.retryable, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.limiter.stream(lambda: self.bound.stream(input, config, **kwargs),
+                                       tokens=self._tokens(input))
+
+    async def astream(self, input, config=None, **kwargs):
+        async for chunk in self.limiter.astream(lambda: self.bound.astream(input, config, **kwargs),
+                                                tokens=self._tokens(input)):
+            yield chunk
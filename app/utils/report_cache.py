@@ -0,0 +1,136 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple
+import numpy as np
+from app.rag.embeddings import embedder_id, get_embeddings
+
+# Configuration
+REPORT_CACHE_PATH = "data/report_cache.db"
+# Reports kept in the vector index (least recently used evicted first)
+REPORT_CACHE_MAX_ENTRIES = 500
+# Similarity at or above which a cached report is returned as it is
+REPORT_REUSE_THRESHOLD = 0.97
+# Similarity at or above which a cached report is rewritten for the new task
+# from its cached research notes (reporter only, no planner/researcher)
+REPORT_REFRESH_THRESHOLD = 0.92
+REPORT_TTL = 7 * 24 * 3600
+# Realtime reports go stale much faster
+REALTIME_REPORT_TTL = 3600
+
+# Same trigger words the researcher uses to classify a query as realtime
+_REALTIME_RE = re.compile(r"\b(today|latest|now|recent|current|breaking|updates?)\b", re.IGNORECASE)
+
+def freshness_class(task: str) -> str:
+    return "realtime" if _REALTIME_RE.search(task) else "general"
+
+class CachedReport(NamedTuple):
+    similarity: float
+    task: str
+    report: str
+    context: List[str]
+
+class ReportCache:
+    """
+    Semantic cache of finished reports.
+
+    Every report is stored in SQLite with the embedding of its task; the
+    embeddings of live entries are also held in one normalized NumPy matrix,
+    so a lookup is a single matrix-vector product. Only entries of the same
+    freshness class (realtime vs. not) and the same embedder can match.
+    Entries expire after their TTL and the index is bounded to max_entries.
+    """
+
+    def __init__(self, path: str = REPORT_CACHE_PATH, max_entries: int = REPORT_CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self.embedder = embedder_id()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reports ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, task TEXT NOT NULL, freshness TEXT NOT NULL, "
+            "embedder TEXT NOT NULL, embedding BLOB NOT NULL, report TEXT NOT NULL, context TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        # In-memory index: ids, freshness classes and the normalized embedding matrix
+        self._evict(time.time())
+        rows = self._conn.execute(
+            "SELECT id, freshness, embedding, expires_at FROM reports WHERE embedder = ? ORDER BY id",
+            (self.embedder,),
+        ).fetchall()
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._freshness = np.array([row[1] for row in rows], dtype=object)
+        self._expires = np.array([row[3] for row in rows], dtype=np.float64)
+        self._matrix = (np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+                        if rows else None)
+
+    def _embed(self, task: str):
+        vector = np.asarray(get_embeddings().embed_query(task), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, task: str, threshold: float = REPORT_REFRESH_THRESHOLD):
+        """Best cached report for a similar task of the same freshness class, or None."""
+        with self._lock:
+            if self._matrix is None:
+                return None
+        vector = self._embed(task)
+        now = time.time()
+        with self._lock:
+            if self._matrix is None:
+                return None
+            scores = self._matrix @ vector
+            scores[(self._freshness != freshness_class(task)) | (self._expires <= now)] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] < threshold:
+                return None
+            entry_id = int(self._ids[best])
+            row = self._conn.execute(
+                "SELECT task, report, context FROM reports WHERE id = ?", (entry_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE reports SET last_access = ? WHERE id = ?", (now, entry_id))
+            self._conn.commit()
+        return CachedReport(float(scores[best]), row[0], row[1], json.loads(row[2]))
+
+    def add(self, task: str, report: str, context: List[str]):
+        freshness = freshness_class(task)
+        ttl = REALTIME_REPORT_TTL if freshness == "realtime" else REPORT_TTL
+        vector = self._embed(task)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO reports (task, freshness, embedder, embedding, report, context, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (task, freshness, self.embedder, vector.tobytes(), report, json.dumps(context), now + ttl, now),
+            )
+            self._conn.commit()
+            self._load()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM reports WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM reports WHERE id NOT IN (SELECT id FROM reports ORDER BY last_access DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._conn.commit()
+
+# One cache per process, shared by every run and session
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_report_cache() -> ReportCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ReportCache()
+    return _cache
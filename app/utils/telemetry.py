@@ -0,0 +1,233 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.config import get_stream_writer
+from opentelemetry import metrics
+
+# Configuration
+# USD per 1M tokens (input, output); the longest matching model prefix wins
+LLM_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+# Metrics export: OTLP when an endpoint is configured, or the console for debugging
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+CONSOLE_METRICS = os.getenv("TELEMETRY_CONSOLE", "0") == "1"
+METRICS_EXPORT_INTERVAL_MS = 10_000
+
+# OpenTelemetry instruments (no-ops until configure_metrics() installs a provider)
+_meter = metrics.get_meter("ai-research-agent")
+_node_duration = _meter.create_histogram("research.node.duration", unit="s",
+                                         description="Wall time of one graph node")
+_tool_duration = _meter.create_histogram("research.tool.duration", unit="s",
+                                         description="Wall time of one tool call (search, retrieval)")
+_llm_tokens = _meter.create_counter("research.llm.tokens", unit="{token}",
+                                    description="LLM tokens by model and type (prompt/completion)")
+_llm_cost = _meter.create_counter("research.llm.cost", unit="USD",
+                                  description="Estimated LLM cost")
+_cache_requests = _meter.create_counter("research.cache.requests", unit="{request}",
+                                        description="Cache lookups by cache and result (hit/miss)")
+
+def configure_metrics():
+    """
+    Installs the OpenTelemetry SDK meter provider (call once at startup).
+    Exports to OTEL_EXPORTER_OTLP_ENDPOINT, or to the console with TELEMETRY_CONSOLE=1.
+    Returns False when nothing is configured (metrics stay no-ops).
+    """
+    if not OTLP_ENDPOINT and not CONSOLE_METRICS:
+        return False
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+
+    if OTLP_ENDPOINT:
+        from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+        exporter = OTLPMetricExporter()
+    else:
+        exporter = ConsoleMetricExporter()
+    reader = PeriodicExportingMetricReader(exporter, export_interval_millis=METRICS_EXPORT_INTERVAL_MS)
+    metrics.set_meter_provider(MeterProvider(metric_readers=[reader]))
+    return True
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    matches = [name for name in LLM_PRICES if (model or "").startswith(name)]
+    if not matches:
+        return 0.0
+    price_in, price_out = LLM_PRICES[max(matches, key=len)]
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+class NodeStats:
+    """What one node execution spent: time, LLM tokens and cost, tool time, cache hits."""
+
+    def __init__(self, node: str):
+        self.node = node
+        self.seconds = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.tool_seconds = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+
+    def as_event(self) -> dict:
+        return {
+            "event": "node", "node": self.node, "seconds": round(self.seconds, 4),
+            "llm_calls": self.llm_calls, "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens, "cost_usd": round(self.cost_usd, 6),
+            "tool_seconds": {tool: round(s, 4) for tool, s in self.tool_seconds.items()},
+            "cache_hits": self.cache_hits, "cache_misses": self.cache_misses,
+        }
+
+# Stats of the node running in the current context (threads and tasks started
+# from the node inherit it)
+_current = ContextVar("telemetry_node_stats", default=None)
+
+def _emit(payload: dict):
+    # Shows up in the graph stream under stream_mode="custom"; outside a run it is dropped
+    try:
+        get_stream_writer()(payload)
+    except Exception:
+        pass
+
+def _finish_node(stats: NodeStats, started: float):
+    stats.seconds = time.perf_counter() - started
+    _node_duration.record(stats.seconds, {"node": stats.node})
+    _emit(stats.as_event())
+
+def instrument_node(name: str, fn):
+    """Wraps a (sync or async) node function: times it and emits a 'node' event with its stats."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def awrapper(state):
+            stats, started = NodeStats(name), time.perf_counter()
+            token = _current.set(stats)
+            try:
+                return await fn(state)
+            finally:
+                _current.reset(token)
+                _finish_node(stats, started)
+        return awrapper
+
+    @functools.wraps(fn)
+    def wrapper(state):
+        stats, started = NodeStats(name), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            return fn(state)
+        finally:
+            _current.reset(token)
+            _finish_node(stats, started)
+    return wrapper
+
+def record_tool(tool: str, seconds: float, **details):
+    _tool_duration.record(seconds, {"tool": tool})
+    stats = _current.get()
+    if stats is not None:
+        with stats._lock:
+            stats.tool_seconds[tool] = stats.tool_seconds.get(tool, 0.0) + seconds
+    _emit({"event": "tool", "tool": tool, "seconds": round(seconds, 4), **details})
+
+@contextmanager
+def tool_span(tool: str, **details):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_tool(tool, time.perf_counter() - started, **details)
+
+def instrument_tool(tool: str):
+    """Decorator timing every call of a (sync or async) tool function."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with tool_span(tool):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tool_span(tool):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_cache(cache: str, hit: bool):
+    _cache_requests.add(1, {"cache": cache, "result": "hit" if hit else "miss"})
+    stats = _current.get()
+    if stats is not None:
+        with stats._lock:
+            if hit:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+    _emit({"event": "cache", "cache": cache, "hit": hit})
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int):
+    cost = llm_cost(model, prompt_tokens, completion_tokens)
+    attributes = {"model": model or "unknown"}
+    _llm_tokens.add(prompt_tokens, {**attributes, "type": "prompt"})
+    _llm_tokens.add(completion_tokens, {**attributes, "type": "completion"})
+    _llm_cost.add(cost, attributes)
+    stats = _current.get()
+    if stats is not None:
+        with stats._lock:
+            stats.llm_calls += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost_usd += cost
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Reads the token usage of every finished LLM call (pass it in the model's callbacks)."""
+
+    # Run in the caller's context, so the usage is booked on the right node
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs):
+        llm_output = response.llm_output or {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                model = (getattr(message, "response_metadata", {}) or {}).get("model_name")
+                model = model or llm_output.get("model_name", "")
+                if usage:
+                    record_llm_usage(model, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+                    return
+        # Older integrations only report the totals in llm_output
+        token_usage = llm_output.get("token_usage") or {}
+        if token_usage:
+            record_llm_usage(llm_output.get("model_name", ""), token_usage.get("prompt_tokens", 0),
+                             token_usage.get("completion_tokens", 0))
+
+# Shared by every model
+usage_callback = LLMUsageCallback()
+
+def summarize(events):
+    """
+    Totals per node over the 'node' events of a run, plus the whole run.
+    Returns {node: {"runs", "seconds", "prompt_tokens", "completion_tokens", "cost_usd", ...}}.
+    """
+    totals = {}
+    for event in events:
+        if event.get("event") != "node":
+            continue
+        for name in (event["node"], "total"):
+            row = totals.setdefault(name, {"runs": 0, "seconds": 0.0, "prompt_tokens": 0,
+                                           "completion_tokens": 0, "cost_usd": 0.0,
+                                           "cache_hits": 0, "cache_misses": 0})
+            row["runs"] += 1
+            for key in ("seconds", "prompt_tokens", "completion_tokens", "cost_usd", "cache_hits", "cache_misses"):
+                row[key] += event[key]
+    # The run total goes last
+    if totals:
+        totals["total"] = totals.pop("total")
+    return totals
@@ -1,27 +1,89 @@
-from openai import OpenAI
-import os
+from concurrent.futures import ThreadPoolExecutor
+import io
+from app.utils.clients import get_openai_client
+from app.utils.rate_limit import get_limiter
+
+# Configuration
+# Recordings shorter than this are sent as one request
+SPLIT_THRESHOLD_MS = 45_000
+# Aim for segments of about this length, cut in the middle of a silence
+TARGET_SEGMENT_MS = 30_000
+# Hard limit for a segment when the speaker never pauses
+MAX_SEGMENT_MS = 60_000
+# A pause must last this long to be used as a cut point
+MIN_SILENCE_MS = 500
+# Silence detection runs on a mono 8 kHz copy, checking every SILENCE_SEEK_MS:
+# about 20x less CPU than every millisecond of the original, same cut points
+SILENCE_SEEK_MS = 10
+SILENCE_FRAME_RATE = 8000
+# Segments transcribed at the same time
+TRANSCRIBE_WORKERS = 4
+
+def _transcribe_bytes(client, audio_bytes: bytes, filename: str = "input.wav") -> str:
+    # Upload straight from memory: no shared temp file on disk
+    transcript = get_limiter("openai_audio").call(
+        client.audio.transcriptions.create,
+        model="whisper-1",
+        file=(filename, audio_bytes, "audio/wav")
+    )
+    return transcript.text.strip()
+
+def _cut_points(audio):
+    """Middle of every pause between two stretches of speech (in ms)."""
+    from pydub.silence import detect_nonsilent
+
+    probe = audio.set_channels(1).set_frame_rate(SILENCE_FRAME_RATE)
+    speech = detect_nonsilent(probe, min_silence_len=MIN_SILENCE_MS, silence_thresh=probe.dBFS - 16,
+                              seek_step=SILENCE_SEEK_MS)
+    return [(end + next_start) // 2 for (_, end), (next_start, _) in zip(speech, speech[1:])]
+
+def split_at_silences(audio):
+    """Splits a pydub AudioSegment into ~TARGET_SEGMENT_MS pieces, cutting inside pauses."""
+    bounds, start = [], 0
+    for cut in _cut_points(audio):
+        if cut - start >= TARGET_SEGMENT_MS:
+            bounds.append((start, cut))
+            start = cut
+    bounds.append((start, len(audio)))
+
+    segments = []
+    for start, end in bounds:
+        # No usable pause: fall back to fixed-size cuts
+        for piece_start in range(start, end, MAX_SEGMENT_MS):
+            segments.append(audio[piece_start:min(piece_start + MAX_SEGMENT_MS, end)])
+    return segments
 
 def transcribe_audio(audio_bytes):
     """
     Converts audio bytes to text using OpenAI Whisper.
+    Long recordings are split at silences and the segments are transcribed
+    in parallel, then stitched back together in order.
     """
-    client = OpenAI()
-    
-    # 1. Save bytes to a temporary file
-    temp_filename = "temp_input.wav"
-    with open(temp_filename, "wb") as f:
-        f.write(audio_bytes)
-        
+    client = get_openai_client()
+
     print("🎤 Transcribing audio...")
-    
-    # 2. Send to Whisper
-    with open(temp_filename, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1", 
-            file=audio_file
-        )
-    
-    # 3. Cleanup
-    os.remove(temp_filename)
-    
-    return transcript.text
\ No newline at end of file
+
+    # 1. Decode the recording in memory (WAV needs no ffmpeg)
+    try:
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(io.BytesIO(audio_bytes), format="wav")
+    except Exception:
+        # Not a WAV we can split: send it as it is
+        return _transcribe_bytes(client, audio_bytes)
+
+    if len(audio) <= SPLIT_THRESHOLD_MS:
+        return _transcribe_bytes(client, audio_bytes)
+
+    # 2. Split long recordings at silences
+    segments = []
+    for segment in split_at_silences(audio):
+        buffer = io.BytesIO()
+        segment.export(buffer, format="wav")
+        segments.append(buffer.getvalue())
+    print(f"   ✂️ Split into {len(segments)} segments")
+
+    # 3. Transcribe in parallel; map() keeps the original order
+    with ThreadPoolExecutor(max_workers=TRANSCRIBE_WORKERS) as pool:
+        texts = pool.map(lambda segment: _transcribe_bytes(client, segment), segments)
+
+    return " ".join(text for text in texts if text)
@@ -1,25 +1,120 @@
-from openai import OpenAI
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
+import re
 import base64
+import tempfile
+from app.utils.cache import SingleFlight
+from app.utils.clients import get_openai_client
+from app.utils.rate_limit import get_limiter
 
-client = OpenAI()
+# Configuration
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+# The speech API rejects inputs longer than this
+MAX_TTS_CHARS = 4096
+# Sentences synthesized at the same time
+TTS_WORKERS = 4
+# Audio already generated for a sentence is reused (keyed by content hash)
+AUDIO_CACHE_DIR = "data/audio_cache"
+
+# The same sentence requested by several threads at once is synthesized once
+_in_flight = SingleFlight()
+
+def split_sentences(text: str, max_chars: int = MAX_TTS_CHARS):
+    """
+    Splits a (Markdown) report into speakable sentences.
+    Markdown markers are removed and no piece is longer than max_chars.
+    """
+    # Drop Markdown syntax that should not be read aloud
+    text = re.sub(r"[#*`>|_]+", " ", text)
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)
+
+    sentences = []
+    for line in text.splitlines():
+        for sentence in re.split(r"(?<=[.!?])\s+", line):
+            sentence = " ".join(sentence.split()).lstrip("-• ").strip()
+            if not re.search(r"\w", sentence):
+                continue
+            # Very long sentences are cut at word boundaries
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                sentences.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+def _cache_path(text: str) -> str:
+    key = hashlib.sha256(f"{TTS_MODEL}|{TTS_VOICE}|{text}".encode("utf-8")).hexdigest()
+    return os.path.join(AUDIO_CACHE_DIR, f"{key}.mp3")
+
+def synthesize(text: str) -> bytes:
+    """
+    Returns MP3 audio for one piece of text (at most MAX_TTS_CHARS).
+    Served from the audio cache when this exact text was spoken before.
+    """
+    path = _cache_path(text)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    return _in_flight.do(path, _synthesize_and_cache, text, path)
+
+def _synthesize_and_cache(text: str, path: str) -> bytes:
+    response = get_limiter("openai_audio").call(
+        get_openai_client().audio.speech.create,
+        model=TTS_MODEL,
+        voice=TTS_VOICE,
+        input=text
+    )
+    audio = response.content
+
+    # Write to a temp file first so a concurrent reader never sees half a file;
+    # the name is unique per call, so concurrent writers never share one
+    os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=AUDIO_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return audio
+
+def stream_report_audio(text: str, max_workers: int = TTS_WORKERS):
+    """
+    Streaming read-aloud pipeline.
+    Synthesizes up to max_workers sentences at once and yields their audio
+    strictly in reading order, each one as soon as it (and every sentence
+    before it) is ready.
+    """
+    sentences = iter(split_sentences(text))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Keep a bounded window of sentences in flight
+        window = deque()
+        for sentence in sentences:
+            window.append(pool.submit(synthesize, sentence))
+            if len(window) >= max_workers:
+                break
+        while window:
+            audio = window.popleft().result()
+            sentence = next(sentences, None)
+            if sentence is not None:
+                window.append(pool.submit(synthesize, sentence))
+            yield audio
 
 def generate_audio(text: str, output_path: str = "report_audio.mp3"):
     """
     Generates audio for the full report and saves it to a file.
     Used for the final readout.
     """
-    # Truncate if too long to save cost/time (optional)
-    short_text = text[:4096] 
-    
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="alloy",
-        input=short_text
-    )
-    
-    # Save to file
-    response.stream_to_file(output_path)
+    # MP3 frames can be concatenated, so the sentence clips form one file
+    with open(output_path, "wb") as f:
+        for audio in stream_report_audio(text):
+            f.write(audio)
     return output_path
 
 def generate_audio_stream(text: str, index: int):
@@ -27,13 +122,8 @@ def generate_audio_stream(text: str, index: int):
     Generates audio for a single sentence chunk (for streaming).
     Returns base64 string for immediate playback.
     """
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="alloy",
-        input=text
-    )
-    
+    audio_content = synthesize(text)
+
     # Return base64 for browser playback
-    audio_content = response.content
     audio_base64 = base64.b64encode(audio_content).decode('utf-8')
-    return audio_base64
\ No newline at end of file
+    return audio_base64
@@ -0,0 +1,38 @@
+import os
+import random
+from fpdf import FPDF
+
+# Vocabulary of the generated documents: topic words plus filler, so BM25
+# and the embeddings both have something to match on
+TOPIC_WORDS = ("quantum cryptography lattice encryption qubit battery lithium electrolyte solar "
+               "photovoltaic vaccine antibody genome protein robot actuator sensor climate carbon "
+               "emission market inflation interest policy regulation network latency protocol").split()
+FILLER_WORDS = ("the of and to in is that for on with as by this are from at be which an was "
+                "results method analysis data study effect between system model approach").split()
+
+def paragraph(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(TOPIC_WORDS if rng.random() < 0.3 else FILLER_WORDS) for _ in range(words))
+
+def make_pdfs(folder: str, files: int, pages: int, words_per_page: int = 350, seed: int = 0):
+    """Writes files PDFs of pages pages each into folder. Returns the total number of pages."""
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    for i in range(files):
+        pdf = FPDF()
+        pdf.set_font("Arial", "", 10)
+        for _ in range(pages):
+            pdf.add_page()
+            pdf.multi_cell(0, 5, paragraph(rng, words_per_page))
+        pdf.output(os.path.join(folder, f"bench_{i:03d}.pdf"))
+    return files * pages
+
+def make_queries(count: int, seed: int = 1):
+    """Short keyword queries over the corpus vocabulary (all distinct)."""
+    rng = random.Random(seed)
+    return [f"{' '.join(rng.sample(TOPIC_WORDS, 3))} {i}" for i in range(count)]
+
+def make_topics(count: int, seed: int = 2):
+    """Distinct research tasks, so no run is served from a cache."""
+    rng = random.Random(seed)
+    return [f"Research the impact of {rng.choice(TOPIC_WORDS)} on {rng.choice(TOPIC_WORDS)} (case {i})"
+            for i in range(count)]
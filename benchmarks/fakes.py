@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from typing import Any, List, get_args
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from app.rag.embeddings import HashingEmbeddings
+
+# Deterministic local stand-ins for ChatOpenAI, OpenAIEmbeddings and
+# DuckDuckGoSearchRun. Latency and payload size are set with configure().
+SETTINGS = {
+    "llm_latency": 0.05,        # seconds per LLM call
+    "llm_words": 200,           # words in a free-text LLM answer
+    "stream_chunk_words": 4,    # words per streamed token chunk
+    "plan_steps": 6,            # steps in a generated plan
+    "local_ratio": 0.3,         # share of research steps routed to the local docs
+    "search_latency": 0.1,      # seconds per web search
+    "search_words": 300,        # words in a web search result
+    "embed_latency": 0.01,      # seconds per embedding request
+}
+
+_WORDS = ("quantum encryption lattice protocol network latency model agent research "
+          "market policy energy battery solar climate vaccine genome robot sensor").split()
+
+def configure(**settings):
+    """Changes the fake latencies / payload sizes (unknown names raise KeyError)."""
+    for name, value in settings.items():
+        if name not in SETTINGS:
+            raise KeyError(f"Unknown fake setting: '{name}'")
+        SETTINGS[name] = value
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def filler(text: str, words: int) -> str:
+    """Deterministic pseudo-text of the given length, seeded by text."""
+    return " ".join(random.Random(_seed(text)).choices(_WORDS, k=words))
+
+def _last_message(prompt) -> str:
+    messages = prompt.to_messages() if hasattr(prompt, "to_messages") else prompt
+    if isinstance(messages, (list, tuple)) and messages:
+        return str(messages[-1].content)
+    return str(prompt)
+
+def _structured(schema, prompt_text: str):
+    """Builds a plausible instance of a pydantic schema from the prompt."""
+    # The researcher asks with "Research Step: <step>\n\nDecision (JSON):"
+    text = re.sub(r"^Research Step:\s*|\s*Decision \(JSON\):\s*$", "", prompt_text.strip())
+    values = {}
+    for name, field in schema.model_fields.items():
+        if name == "steps":
+            values[name] = [f"Step {i + 1} of researching {text}" for i in range(SETTINGS["plan_steps"])]
+        elif name == "search_query":
+            values[name] = text
+        elif name == "source":
+            local = (_seed(text) % 1000) / 1000 < SETTINGS["local_ratio"]
+            values[name] = "local" if local else "web"
+        elif field.is_required():
+            options = get_args(field.annotation)
+            values[name] = options[0] if options else text
+    return schema(**values)
+
+class FakeChatOpenAI(BaseChatModel):
+    """Chat model with a fixed delay; answers are generated from the prompt."""
+
+    model: str = "fake-gpt"
+    temperature: float = 0
+
+    def __init__(self, **kwargs: Any):
+        # Accept (and ignore) every other ChatOpenAI argument
+        super().__init__(**{k: v for k, v in kwargs.items() if k in ("model", "temperature", "callbacks")})
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-openai"
+
+    def _answer(self, messages) -> str:
+        return "# Report\n\n" + filler(_last_message(messages), SETTINGS["llm_words"])
+
+    def _result(self, messages) -> ChatResult:
+        answer = self._answer(messages)
+        # Rough token counts, so the telemetry has something to add up
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+        completion_tokens = len(answer) // 4
+        message = AIMessage(
+            content=answer,
+            response_metadata={"model_name": self.model},
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(SETTINGS["llm_latency"])
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(SETTINGS["llm_latency"])
+        return self._result(messages)
+
+    def _chunks(self, messages) -> List[str]:
+        words = self._answer(messages).split(" ")
+        size = max(1, SETTINGS["stream_chunk_words"])
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = self._chunks(messages)
+        usage = self._result(messages).generations[0].message.usage_metadata
+        for i, text in enumerate(chunks):
+            time.sleep(SETTINGS["llm_latency"] / len(chunks))
+            # Like stream_usage=True: the last chunk carries the token counts
+            last = i == len(chunks) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=text, usage_metadata=usage if last else None,
+                response_metadata={"model_name": self.model} if last else {},
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = self._chunks(messages)
+        usage = self._result(messages).generations[0].message.usage_metadata
+        for i, text in enumerate(chunks):
+            await asyncio.sleep(SETTINGS["llm_latency"] / len(chunks))
+            # Like stream_usage=True: the last chunk carries the token counts
+            last = i == len(chunks) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=text, usage_metadata=usage if last else None,
+                response_metadata={"model_name": self.model} if last else {},
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, **kwargs):
+        def invoke(prompt):
+            time.sleep(SETTINGS["llm_latency"])
+            return _structured(schema, _last_message(prompt))
+
+        async def ainvoke(prompt):
+            await asyncio.sleep(SETTINGS["llm_latency"])
+            return _structured(schema, _last_message(prompt))
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+class FakeOpenAIEmbeddings(HashingEmbeddings):
+    """Feature-hashing embeddings (similar texts get similar vectors) with a fixed delay per request."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__()
+
+    def embed_query(self, text):
+        time.sleep(SETTINGS["embed_latency"])
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        # One request per batch, like the real API
+        time.sleep(SETTINGS["embed_latency"])
+        return [HashingEmbeddings.embed_query(self, text) for text in texts]
+
+class FakeDuckDuckGoSearchRun:
+    """Web search returning deterministic snippets after a fixed delay."""
+
+    def __init__(self, **kwargs: Any):
+        pass
+
+    def run(self, query: str) -> str:
+        time.sleep(SETTINGS["search_latency"])
+        return filler(query, SETTINGS["search_words"])
+
+    def invoke(self, query: str) -> str:
+        return self.run(query)
+
+def install():
+    """
+    Replaces the real clients with the fakes.
+    Must run before any app module is imported (they bind the classes at import time).
+    """
+    import langchain_community.tools
+    import langchain_openai
+
+    langchain_openai.ChatOpenAI = FakeChatOpenAI
+    langchain_openai.OpenAIEmbeddings = FakeOpenAIEmbeddings
+    langchain_community.tools.DuckDuckGoSearchRun = FakeDuckDuckGoSearchRun
+
+    # The fakes have no quota: measure the app, not the providers' rate limits
+    from app.utils.rate_limit import PROVIDER_LIMITS
+    for limits in PROVIDER_LIMITS.values():
+        limits.update(requests_per_minute=10 ** 9, tokens_per_minute=None, max_concurrency=1024,
+                      latency_target=None)
+    # The fake plan steps share a template, and the hashing embedder scores any two
+    # of them ~0.85 similar: only merge steps that are actually the same
+    os.environ.setdefault("PLAN_MERGE_THRESHOLD", "0.99")
@@ -0,0 +1,78 @@
+"""
+Import-time budget for the entry points.
+
+Every probe runs in a fresh interpreter (cold start, nothing cached) inside a
+throw-away workspace and without OPENAI_API_KEY, so it also checks that
+importing the app needs no key and makes no API call:
+  - app.main          importing the CLI / graph
+  - streamlit_app     first execution of the Streamlit script (bare mode)
+  - streamlit_rerun   a second execution in the same process, i.e. what
+                      every widget interaction costs
+
+Usage (from the repository root):
+  python -m benchmarks.import_time     # exit code 1 when a probe is over budget
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STREAMLIT_SCRIPT = os.path.join(REPO_ROOT, "streamlit_app.py")
+# Median wall time allowed per probe (seconds)
+IMPORT_BUDGETS = {
+    "app.main": 1.5,
+    "streamlit_app": 2.5,
+    "streamlit_rerun": 0.1,
+}
+REPEATS = 5
+
+# (setup, timed statement) per probe
+_PROBES = {
+    "app.main": ("", "import app.main"),
+    "streamlit_app": ("", f"runpy.run_path({STREAMLIT_SCRIPT!r})"),
+    "streamlit_rerun": (f"runpy.run_path({STREAMLIT_SCRIPT!r})", f"runpy.run_path({STREAMLIT_SCRIPT!r})"),
+}
+
+_TEMPLATE = """
+import runpy, time
+{setup}
+start = time.perf_counter()
+{statement}
+print("IMPORT_SECONDS", time.perf_counter() - start)
+"""
+
+def measure(probe: str, workspace: str) -> float:
+    setup, statement = _PROBES[probe]
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    completed = subprocess.run(
+        [sys.executable, "-c", _TEMPLATE.format(setup=setup, statement=statement)],
+        cwd=workspace, env=env, capture_output=True, text=True, check=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith("IMPORT_SECONDS"):
+            return float(line.split()[1])
+    raise RuntimeError(f"Probe '{probe}' printed no timing:\n{completed.stdout}\n{completed.stderr}")
+
+def measure_all(repeats: int = REPEATS):
+    """Median seconds per probe."""
+    with tempfile.TemporaryDirectory(prefix="research-import-") as workspace:
+        return {
+            probe: statistics.median(measure(probe, workspace) for _ in range(repeats))
+            for probe in _PROBES
+        }
+
+def main():
+    over = []
+    for probe, seconds in measure_all().items():
+        budget = IMPORT_BUDGETS[probe]
+        ok = seconds <= budget
+        if not ok:
+            over.append(probe)
+        print(f"{'✅' if ok else '❌'} {probe:<16} {seconds * 1000:>8.1f} ms  (budget {budget * 1000:.0f} ms)")
+    return 1 if over else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
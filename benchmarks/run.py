@@ -0,0 +1,248 @@
+"""
+Offline benchmark suite for the research agent.
+
+Runs the real graph, ingestion pipeline and retriever against deterministic
+local fakes of ChatOpenAI, OpenAIEmbeddings and DuckDuckGoSearchRun
+(benchmarks/fakes.py), inside a throw-away workspace, and measures:
+  - per-node latency (planner, researcher step, reporter)
+  - end-to-end research runs/s under concurrency
+  - ingestion pages/s over a generated PDF corpus
+  - retrieval queries/s (hybrid and vector mode)
+  - cold import time of app.main / streamlit_app (benchmarks/import_time.py)
+Results are compared with benchmarks/baseline.json; the exit code is 1 when
+a metric is worse than the baseline by more than the tolerance.
+
+Usage (from the repository root):
+  python -m benchmarks.run                   # run and compare
+  python -m benchmarks.run --save-baseline   # run and store as the new baseline
+  python -m benchmarks.run --quick           # smaller corpus / fewer runs
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+# A metric regresses when it is this much worse than the baseline
+DEFAULT_TOLERANCE = 0.25
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake LLM, search and embeddings.")
+    parser.add_argument("--quick", action="store_true", help="smaller corpus and fewer runs")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write the results to {BASELINE_PATH}")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel research runs")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.1, help="seconds per fake web search")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="seconds per fake embedding request")
+    parser.add_argument("--llm-words", type=int, default=200, help="words per fake LLM answer")
+    parser.add_argument("--search-words", type=int, default=300, help="words per fake search result")
+    parser.add_argument("--keep-workspace", action="store_true", help="do not delete the temp workspace")
+    return parser.parse_args(argv)
+
+@contextlib.contextmanager
+def quiet():
+    # The agents print progress for every step; keep the benchmark output readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+def timed(fn, *args):
+    # Collect first: a full GC pass left over from a previous phase is not the node's cost
+    gc.collect()
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+# --- Benchmarks ---
+
+def bench_ingestion(files: int, pages: int):
+    from benchmarks.corpus import make_pdfs
+    from app.rag.ingest import DOCS_FOLDER, ingest_documents
+
+    total_pages = make_pdfs(DOCS_FOLDER, files, pages)
+    with quiet():
+        elapsed = timed(ingest_documents)
+    return {"ingest_pages_per_s": total_pages / elapsed}
+
+def bench_retrieval(queries: int):
+    from benchmarks.corpus import make_queries
+    from app.tools.retrieve import get_retriever
+
+    retriever = get_retriever()
+    retriever.search("warm up")
+    results = {}
+    for seed, mode in enumerate(("hybrid", "vector"), start=1):
+        # Distinct queries: measures the embedding + search path, not the embedding cache
+        batch = make_queries(queries, seed=seed)
+        start = time.perf_counter()
+        for query in batch:
+            retriever.search(query, mode=mode)
+        results[f"retrieval_{mode}_qps"] = len(batch) / (time.perf_counter() - start)
+    return results
+
+def bench_nodes(iterations: int):
+    from app.agents.planner import plan_node
+    from app.agents.researcher import research_step_node
+    from app.agents.reporter import reporter_node
+
+    samples = {"planner": [], "researcher_step": [], "reporter": []}
+    with quiet():
+        for i in range(iterations):
+            # Fresh texts every iteration so no step memo / search cache entry is hit
+            task = f"Benchmark node latency of topic {i} {time.time_ns()}"
+            samples["planner"].append(timed(plan_node, {"task": task}))
+            samples["researcher_step"].append(
+                timed(research_step_node, {"task": task, "step": f"Collect sources on {task}", "step_index": 0})
+            )
+            context = [{"step": s, "content": f"Finding {s} about {task}. " * 40} for s in range(6)]
+            samples["reporter"].append(timed(reporter_node, {"task": task, "context": context}))
+
+    results = {}
+    for node, values in samples.items():
+        results[f"node_{node}_p50_ms"] = percentile(values, 0.5) * 1000
+        results[f"node_{node}_p95_ms"] = percentile(values, 0.95) * 1000
+    return results
+
+def bench_end_to_end(runs: int, concurrency: int):
+    from benchmarks.corpus import make_topics
+    from app.graphs.graph import graph
+    from app.main import _initial_state, new_config
+
+    def run(topic):
+        start = time.perf_counter()
+        final = graph.invoke(_initial_state(topic), config=new_config())
+        assert final.get("report"), "run finished without a report"
+        return time.perf_counter() - start
+
+    results = {}
+    for level in sorted({1, concurrency}):
+        topics = make_topics(runs, seed=level)
+        with quiet(), ThreadPoolExecutor(max_workers=level) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(run, topics))
+            elapsed = time.perf_counter() - start
+        results[f"e2e_runs_per_s_c{level}"] = runs / elapsed
+        results[f"e2e_run_p50_ms_c{level}"] = statistics.median(latencies) * 1000
+    return results
+
+def bench_imports(repeats: int):
+    from benchmarks.import_time import measure_all
+
+    # The rerun probe takes a few ms: too noisy for a relative comparison,
+    # it is only checked against its absolute budget
+    return {f"import_{probe.replace('.', '_')}_ms": seconds * 1000
+            for probe, seconds in measure_all(repeats).items() if probe != "streamlit_rerun"}
+
+# --- Baseline ---
+
+def higher_is_better(metric: str) -> bool:
+    # Throughputs (…_per_s, …_qps) should go up, latencies (…_ms) down
+    return "_per_s" in metric or metric.endswith("_qps")
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Prints a comparison table and returns the names of the regressed metrics."""
+    regressions = []
+    print(f"\n{'metric':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        if base is None:
+            print(f"{metric:<32} {'-':>12} {value:>12.2f} {'new':>9}")
+            continue
+        change = (value - base) / base if base else 0.0
+        worse = -change if higher_is_better(metric) else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(metric)
+            flag = "  ❌ regression"
+        print(f"{metric:<32} {base:>12.2f} {value:>12.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # 1. Swap in the fakes before any app module binds the real clients
+    sys.path.insert(0, REPO_ROOT)
+    from benchmarks import fakes
+    fakes.install()
+    fakes.configure(llm_latency=args.llm_latency, search_latency=args.search_latency,
+                    embed_latency=args.embed_latency, llm_words=args.llm_words,
+                    search_words=args.search_words)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["EMBEDDING_BACKEND"] = "openai"
+
+    # 2. Every data/ and docs/ path is relative: run inside a fresh workspace
+    workspace = tempfile.mkdtemp(prefix="research-bench-")
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    print(f"🏁 Benchmarking in {workspace}")
+
+    files, pages, queries, iterations, runs = (4, 5, 100, 5, 8) if args.quick else (12, 10, 400, 20, 24)
+    results = {}
+    try:
+        # 3. Ingestion first: the researcher's local steps query the generated corpus
+        print("📚 Ingestion...")
+        results.update(bench_ingestion(files, pages))
+        print("🔎 Retrieval...")
+        results.update(bench_retrieval(queries))
+        print("🧩 Node latency...")
+        results.update(bench_nodes(iterations))
+        print("🚀 End-to-end runs...")
+        results.update(bench_end_to_end(runs, args.concurrency))
+        print("📦 Import time...")
+        results.update(bench_imports(3 if args.quick else 5))
+    finally:
+        os.chdir(cwd)
+        if not args.keep_workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    # 4. Compare with / store the baseline
+    report = {
+        "metrics": results,
+        "settings": {**fakes.SETTINGS, "quick": args.quick, "concurrency": args.concurrency},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        compare(results, {}, args.tolerance)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        compare(results, {}, args.tolerance)
+        print(f"\n⚠️ No baseline at {args.baseline} (run with --save-baseline)")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != report["settings"]:
+        print("\n⚠️ Fake settings differ from the baseline's; the comparison is not like for like.")
+    regressions = compare(results, baseline["metrics"], args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No regressions (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
 import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
 import os
-import time  # <--- WAPAS ADD KIYA (Streaming ke liye)
+import uuid
+from app.utils.clients import get_openai_client
 
 # 1. Load Environment
 load_dotenv()
-client = OpenAI()
+
+# How often the research page checks on the background job (seconds)
+JOB_POLL_SECONDS = 1.0
 
 st.set_page_config(page_title="AI Research Consultant", page_icon="🕵️‍♂️", layout="wide")
 st.title("🕵️‍♂️ Consultative Research Agent")
@@ -22,15 +24,25 @@ if "research_plan" not in st.session_state:
     st.session_state.research_plan = ""
 if "user_answers" not in st.session_state:
     st.session_state.user_answers = ""
+if "thread_id" not in st.session_state:
+    # Every browser session gets its own checkpoint thread
+    st.session_state.thread_id = uuid.uuid4().hex
 
-# --- HELPER FUNCTIONS ---
+# --- SHARED RESOURCES ---
+# Created once per server process and shared by every session and rerun
+
+@st.cache_resource
+def get_client():
+    return get_openai_client()
+
+@st.cache_resource
+def get_jobs():
+    # Background worker pool: research runs outside the script's rerun cycle
+    # (importing it builds the graph, once)
+    from app.jobs import get_job_manager
+    return get_job_manager()
 
-# 1. Streaming Function (WAPAS AAGAYA!) 🌊
-def stream_text(text):
-    """Simulates typing effect for the report."""
-    for word in text.split(" "):
-        yield word + " "
-        time.sleep(0.02)
+# --- HELPER FUNCTIONS ---
 
 def get_clarification_questions(topic):
     prompt = f"""
@@ -39,9 +51,11 @@ def get_clarification_questions(topic):
     Ask 3 critical questions to clarify their intent.
     Format as a bulleted list.
     """
-    completion = client.chat.completions.create(
+    completion = get_limiter("openai").call(
+        get_client().chat.completions.create,
         model="gpt-4o", 
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        tokens=estimate_tokens(prompt) + DEFAULT_COMPLETION_TOKENS
     )
     return completion.choices[0].message.content
 
@@ -51,16 +65,19 @@ def create_research_plan(topic, answers):
     User Constraints: {answers}
     Create a strictly numbered Research Plan (max 5 steps).
     """
-    completion = client.chat.completions.create(
+    completion = get_limiter("openai").call(
+        get_client().chat.completions.create,
         model="gpt-4o", 
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        tokens=estimate_tokens(prompt) + DEFAULT_COMPLETION_TOKENS
     )
     return completion.choices[0].message.content
 
 # --- IMPORT AGENT ---
 try:
-    from app.graphs.graph import graph
-    from app.utils.pdf_generator import create_pdf
+    from app.utils.rate_limit import DEFAULT_COMPLETION_TOKENS, estimate_tokens, get_limiter
+    from app.utils.telemetry import summarize
+    from app.utils.pdf_generator import render_pdf
 except ImportError:
     st.error("⚠️ Backend modules missing.")
     st.stop()
@@ -134,42 +151,74 @@ elif st.session_state.state == "researching":
     Plan: {st.session_state.research_plan}
     """
     
-    status_box = st.empty()
-    output_box = st.empty()
-    final_report = ""
-    
-    try:
-        config = {"configurable": {"thread_id": "1"}}
-        initial_state = {"task": final_prompt, "current_step": 0, "context": []}
-        
-        for event in graph.stream(initial_state, config=config):
-            for key, value in event.items():
-                if key == "planner":
-                    status_box.info("✅ **Plan Validated.**")
-                elif key == "researcher":
-                    status_box.info(f"🔎 **Gathering Intelligence... (Step {value.get('current_step', 1)})**")
-                elif key == "reporter":
-                    status_box.success("📝 **Writing Report...**")
-                    final_report = value.get("report", "")
-
-        status_box.empty()
-        
-        # --- ✨ MAGIC: STREAMING EFFECT ---
+    # The run belongs to this session's thread: reruns (downloads, button
+    # clicks) look the job up again instead of starting a new run
+    jobs = get_jobs()
+    from app.jobs import QueueFullError  # loaded by get_jobs() by now
+    snapshot = st.session_state.get("job_result")
+    if snapshot is None:
+        job = jobs.get(st.session_state.get("job_id", ""))
+        if job is None:
+            try:
+                job = jobs.submit(final_prompt, st.session_state.thread_id)
+            except QueueFullError:
+                st.warning("⏳ All research workers are busy. Please try again in a minute.")
+                st.stop()
+            st.session_state.job_id = job.id
+
+        # 1. While the job runs: poll its progress and show the report as it is written 🌊
+        if job.active:
+            @st.fragment(run_every=JOB_POLL_SECONDS)
+            def job_progress():
+                snapshot = job.snapshot()
+                if snapshot["status"] not in ("queued", "running"):
+                    # Finished: render the final page once, without polling
+                    st.rerun()
+                st.info(f"🔎 **{snapshot['stage']}**")
+                st.subheader("📄 Final Consultant Report")
+                st.markdown(snapshot["report"])
+
+            job_progress()
+            st.stop()
+
+        # The job manager forgets finished jobs after a while: the session keeps
+        # its own copy of the result, so a later rerun never starts a new run
+        snapshot = st.session_state.job_result = job.snapshot()
+
+    # 2. Finished (or failed) job
+    final_report = snapshot["report"]
+
+    if snapshot["status"] == "failed":
+        st.error(f"❌ An error occurred: {snapshot['error']}")
+        # Same thread: the retry resumes from the last checkpoint
+        if st.button("🔁 Retry"):
+            st.session_state.job_id = jobs.submit(final_prompt, st.session_state.thread_id).id
+            del st.session_state.job_result
+            st.rerun()
+
+    if final_report:
         st.subheader("📄 Final Consultant Report")
-        if final_report:
-            # Ye line text ko type hote hue dikhayegi
-            st.write_stream(stream_text(final_report))
-        
-        # Post-Processing
-        if final_report:
-            st.markdown("---")
-            pdf_path = create_pdf(final_report)
-            with open(pdf_path, "rb") as f:
-                st.download_button("📥 Download PDF", data=f, file_name="consultant_report.pdf")
-            
-            if st.button("🆕 Start New Research"):
-                st.session_state.clear()
-                st.rerun()
+        st.markdown(final_report)
+
+    # Where the time (and money) of this run went, per node
+    totals = summarize(snapshot["telemetry"])
+    if totals:
+        with st.expander("⏱️ Run timings"):
+            st.table([
+                {"node": node, "runs": row["runs"], "seconds": round(row["seconds"], 2),
+                 "tokens": row["prompt_tokens"] + row["completion_tokens"],
+                 "cost ($)": round(row["cost_usd"], 4),
+                 "cache hits": f"{row['cache_hits']}/{row['cache_hits'] + row['cache_misses']}"}
+                for node, row in totals.items()
+            ])
+
+    # Post-Processing
+    if final_report:
+        st.markdown("---")
+        # Rendered in memory once per report, then served from cache on reruns
+        st.download_button("📥 Download PDF", data=render_pdf(final_report),
+                           file_name="consultant_report.pdf", mime="application/pdf")
 
-    except Exception as e:
-        st.error(f"❌ An error occurred: {e}")
\ No newline at end of file
+    if st.button("🆕 Start New Research"):
+        st.session_state.clear()
+        st.rerun()
@@ -0,0 +1,54 @@
+from app.rag.bm25 import BM25Index
+
+DOCS = {
+    "a-0": "Quantum computers break RSA encryption with Shor's algorithm.",
+    "a-1": "Lattice-based cryptography resists quantum attacks.",
+    "b-0": "The XR-2000 sensor reports battery voltage every second.",
+    "b-1": "Battery chemistry limits how fast a solar microgrid can store energy.",
+    "c-0": "Vaccine trials track genome changes in the virus over time.",
+    "c-1": "Post-quantum encryption standards were published for network protocols.",
+    "d-0": "Firmware v1.2 of the XR-2000 fixes the sensor latency bug.",
+}
+QUERIES = ["quantum encryption", "XR-2000 sensor", "battery energy", "genome", "v1.2 latency", "unknown"]
+
+def ranking(index, query):
+    return [(index.ids[doc], round(score, 9)) for doc, score in index.search(query, k=len(DOCS))]
+
+def build(ids):
+    return BM25Index.build(ids, [DOCS[i] for i in ids])
+
+def assert_same_ranking(index, expected):
+    for query in QUERIES:
+        assert ranking(index, query) == ranking(expected, query), query
+
+def test_incremental_updates_rank_like_a_rebuild(tmp_path):
+    index = build(["a-0", "a-1", "b-0"])
+    index.add(["b-1", "c-0"], [DOCS["b-1"], DOCS["c-0"]])
+    index.remove(["a-1", "b-0"])
+    index.add(["c-1", "d-0"], [DOCS["c-1"], DOCS["d-0"]])
+    index.remove(["not-indexed"])
+    live = ["a-0", "b-1", "c-0", "c-1", "d-0"]
+
+    assert len(index) == len(live)
+    assert_same_ranking(index, build(live))
+
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = BM25Index.load(path)
+    assert sorted(loaded.ids) == sorted(live)
+    assert_same_ranking(loaded, build(live))
+
+def test_removing_most_chunks_compacts_the_slots():
+    index = build(list(DOCS))
+    index.remove(["a-0", "a-1", "b-0", "b-1", "c-0"])
+    assert index.ids == ["c-1", "d-0"]
+    assert_same_ranking(index, build(["c-1", "d-0"]))
+
+def test_removing_everything_leaves_an_empty_index(tmp_path):
+    index = build(list(DOCS))
+    index.remove(list(DOCS))
+    assert len(index) == 0
+    assert index.search("quantum") == []
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    assert len(BM25Index.load(path)) == 0
@@ -0,0 +1,71 @@
+from typing import TypedDict
+import pytest
+from langgraph.graph import END, START, StateGraph
+from app.utils import rate_limit
+from app.utils.rate_limit import RateLimited
+from benchmarks.fakes import FakeChatOpenAI, configure
+
+class Throttled(Exception):
+    status_code = 429
+
+class FlakyChat(FakeChatOpenAI):
+    """Its first stream fails after 'fail_after' chunks (0: before any token)."""
+
+    fail_after: int = 0
+    calls: int = 0
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        for i, chunk in enumerate(super()._stream(messages, stop, run_manager, **kwargs)):
+            if self.calls == 1 and i == self.fail_after:
+                raise Throttled("slow down")
+            yield chunk
+
+class State(TypedDict):
+    answer: str
+
+@pytest.fixture(autouse=True)
+def fast(monkeypatch):
+    configure(llm_latency=0)
+    monkeypatch.setattr(rate_limit.ProviderLimiter, "backoff", lambda self, attempt, exc: 0)
+
+def flaky(fail_after: int) -> FlakyChat:
+    model = FlakyChat()
+    model.fail_after = fail_after
+    return model
+
+def stream_node(model):
+    """Streams a one-node graph whose node invokes the model without passing a config."""
+    def node(state):
+        return {"answer": model.invoke("hi").content}
+
+    workflow = StateGraph(State)
+    workflow.add_node("node", node)
+    workflow.add_edge(START, "node")
+    workflow.add_edge("node", END)
+    chunks, answer = [], None
+    for mode, event in workflow.compile().stream({"answer": ""}, stream_mode=["messages", "updates"]):
+        if mode == "messages":
+            chunks.append(event[0].content)
+        else:
+            answer = event["node"]["answer"]
+    return chunks, answer
+
+def test_wrapped_model_stays_in_the_graph_callbacks():
+    plain, _ = stream_node(FakeChatOpenAI())
+    wrapped, answer = stream_node(RateLimited(FakeChatOpenAI()))
+    assert len(plain) > 1
+    assert wrapped == plain
+    assert "".join(wrapped) == answer
+
+def test_retries_before_the_first_token():
+    model = flaky(fail_after=0)
+    chunks, answer = stream_node(RateLimited(model))
+    assert model.calls == 2
+    assert "".join(chunks) == answer
+
+def test_no_retry_once_tokens_streamed():
+    model = flaky(fail_after=3)
+    with pytest.raises(Throttled):
+        stream_node(RateLimited(model))
+    assert model.calls == 1
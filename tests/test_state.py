@@ -0,0 +1,14 @@
+from app.graphs.state import RESET_CONTEXT, merge_context
+
+def result(step: int, content: str = "notes"):
+    return {"step": step, "content": f"{content} {step}"}
+
+def test_results_are_kept_in_plan_order():
+    merged = merge_context([result(2)], [result(0), "plain", result(1)])
+    assert merged == [result(0), result(1), result(2), "plain"]
+
+def test_reset_drops_the_previous_run():
+    previous = [result(i, "old") for i in range(6)]
+    merged = merge_context(previous, [RESET_CONTEXT])
+    assert merged == []
+    assert merge_context(merged, [result(1), result(0)]) == [result(0), result(1)]